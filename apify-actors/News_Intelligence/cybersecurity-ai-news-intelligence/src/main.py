@@ -5,7 +5,7 @@ from typing import List, TypedDict
 import asyncio
 import hashlib
 from .models import RSSFeed, Article, InputConfig, DatasetRecord, SnippetSource
-from .tools import fetch_rss_feeds, fetch_summary_from_duckduckgo, analyze_article_summary
+from .tools import fetch_rss_feeds, dedupe_articles, fetch_summary_from_duckduckgo, analyze_article_summary
 from apify.storages import KeyValueStore
 
 class WorkflowState(TypedDict):
@@ -23,6 +23,7 @@ async def rss_fetcher(state: WorkflowState) -> dict:
         custom_url=config.customFeedUrl,
         max_articles=config.maxArticles
     )
+    all_articles_from_feed = dedupe_articles(all_articles_from_feed)
 
     new_articles = []
     Actor.log.info(f"Fetched {len(all_articles_from_feed)} total articles. Checking for duplicates...")
@@ -52,7 +53,7 @@ import asyncio
 import hashlib
 import re # Added for HTML stripping helper function
 from .models import RSSFeed, Article, InputConfig, DatasetRecord, SnippetSource
-from .tools import fetch_rss_feeds, fetch_summary_from_duckduckgo, analyze_article_summary
+from .tools import fetch_rss_feeds, dedupe_articles, fetch_summary_from_duckduckgo, analyze_article_summary
 from apify.storages import KeyValueStore
 
 # --- HELPER FUNCTION FOR CLEANING (REQUIRED FOR FALLBACK) ---
@@ -1,25 +1,54 @@
 import feedparser
 import re
 import os
+import io
 import json
+import time
+import hashlib
 import asyncio
-from typing import List, Dict, Any, Tuple
+import functools
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Tuple, TYPE_CHECKING
 from apify import Actor
-from apify_client import ApifyClient
-from openai import OpenAI
 from .models import RSSFeed
-from langchain_community.tools import DuckDuckGoSearchResults
-from langchain_community.utilities import DuckDuckGoSearchAPIWrapper 
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
-def init_openai() -> OpenAI:
+# openai and ddgs are imported on first use to keep actor cold starts fast
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+@functools.lru_cache(maxsize=1)
+def init_openai() -> "OpenAI":
+    from openai import OpenAI
     return OpenAI()
 
+# Opt-in token streaming for chat completions (set OPENAI_STREAM=true to enable)
+STREAM_LLM_RESPONSES = os.getenv("OPENAI_STREAM", "false").lower() in ("1", "true", "yes")
+
+def complete_chat(client: "OpenAI", **kwargs) -> str:
+    """Runs a chat completion and returns the stripped message text, streaming the tokens when enabled."""
+    if not STREAM_LLM_RESPONSES:
+        response = client.chat.completions.create(**kwargs)
+        return response.choices[0].message.content.strip()
+
+    buffer = io.StringIO()
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if chunk.choices and chunk.choices[0].delta.content:
+            buffer.write(chunk.choices[0].delta.content)
+    return buffer.getvalue().strip()
+
 CATEGORIES = [
     "Vulnerability/CVE", "Malware/Ransomware", "Policy/Compliance",
     "Data Breach/Hack", "Threat Intelligence", "Cloud Security",
     "IoT/Hardware", "General InfoSec"
 ]
 
+SENTIMENT_OPTIONS = ("High Risk", "Medium Risk", "Low Risk/Informational")
+SENTIMENT_SET = frozenset(SENTIMENT_OPTIONS)
+SENTIMENT_LIST_STR = ", ".join(SENTIMENT_OPTIONS)
+CATEGORY_LIST_STR = ", ".join(CATEGORIES)
+
 def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10) -> List[RSSFeed]:
     # ... (rest of the function remains the same) ...
     feed_map = {
@@ -87,6 +116,60 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10)
     return articles
 
 
+def _published_timestamp(published: str | None) -> float:
+    """Best-effort epoch timestamp for an RSS date string; unknown dates sort last."""
+    if not published:
+        return float("inf")
+    try:
+        return parsedate_to_datetime(published).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(published.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return float("inf")
+
+
+def dedupe_articles(articles: List[RSSFeed], similarity_threshold: float = 0.85) -> List[RSSFeed]:
+    """
+    Collapses the same story syndicated across several feeds into one article.
+    Titles are matched on a normalized key first, then on word-set Jaccard similarity
+    for near-duplicates. The earliest-published article of each cluster is kept.
+    """
+    kept: List[RSSFeed] = []
+    kept_tokens: List[set] = []
+    key_index: Dict[str, int] = {}
+
+    for article in articles:
+        title = article.title.lower()
+        key = re.sub(r'[^a-z0-9]+', '', title)[:80]
+        if not key:
+            kept.append(article)
+            kept_tokens.append(set())
+            continue
+
+        tokens = set(re.findall(r'[a-z0-9]+', title))
+        match = key_index.get(key)
+        if match is None:
+            match = next(
+                (i for i, seen in enumerate(kept_tokens)
+                 if seen and len(tokens & seen) / len(tokens | seen) >= similarity_threshold),
+                None
+            )
+
+        if match is None:
+            key_index[key] = len(kept)
+            kept.append(article)
+            kept_tokens.append(tokens)
+        elif _published_timestamp(article.published) < _published_timestamp(kept[match].published):
+            kept[match] = article
+            key_index[key] = match
+
+    if len(kept) < len(articles):
+        Actor.log.info(f"Removed {len(articles) - len(kept)} duplicate articles across feeds.")
+    return kept
+
+
 async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
     # ... (rest of the function remains the same) ...
     if is_test_mode: return "This is a test summary generated from dummy search snippets. It notes that Source A reported a vulnerability while Source B downplayed the risk, showcasing a variation in reporting."
@@ -94,7 +177,8 @@ async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
     client = init_openai()
     prompt = f"Synthesize a concise, neutral, one-paragraph summary of the main news event from the following search results. Note the different sources and dates, and **briefly mention any significant variations in their reporting (e.g., conflicting facts, different sentiment)**.\n\nSnippets:\n---\n{snippets}\n---"
     try:
-        response = client.chat.completions.create(
+        summary = complete_chat(
+            client,
             model="gpt-3.5-turbo-0125",
             messages=[
                 {"role": "system", "content": "You are a news summarization assistant. Your goal is to synthesize a single, coherent paragraph from multiple sourced snippets. Base your summary *only* on the snippets. If you detect notable differences in reporting between sources, briefly mention it."},
@@ -102,7 +186,6 @@ async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
             ],
             temperature=0.2,
         )
-        summary = response.choices[0].message.content.strip()
         Actor.log.info("Successfully generated summary from search snippets.")
         return summary
     except Exception as e:
@@ -110,6 +193,43 @@ async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
         return ""
 
 
+# Cross-run cache of DuckDuckGo summaries; freshness follows the requested search window
+SEARCH_CACHE_STORE_NAME = "ddg-summary-cache-cybersecurity"  # per-actor: named stores are shared across the account
+SEARCH_CACHE_TTL_SECONDS = {"d": 3600, "w": 6 * 3600, "m": 12 * 3600, "any": 24 * 3600}
+_search_cache_store = None
+
+async def open_search_cache():
+    """Opens (once per run) the key-value store holding cached DuckDuckGo summaries."""
+    global _search_cache_store
+    if _search_cache_store is None:
+        _search_cache_store = await Actor.open_key_value_store(name=SEARCH_CACHE_STORE_NAME)
+    return _search_cache_store
+
+
+def _is_ddg_transient_error(exc: BaseException) -> bool:
+    from ddgs.exceptions import RatelimitException, TimeoutException
+    return isinstance(exc, (RatelimitException, TimeoutException))
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=10),
+    retry=retry_if_exception(_is_ddg_transient_error),
+    reraise=True,
+)
+async def search_ddg_news(query: str, region: str | None, time_limit: str | None) -> List[Dict[str, str]]:
+    """
+    Runs a DuckDuckGo News search through the `ddgs` client, retrying with backoff on rate limits.
+    """
+    def run_search():
+        from ddgs import DDGS
+        with DDGS() as ddgs:
+            return ddgs.news(query, region=region or "wt-wt", timelimit=time_limit, max_results=20)
+
+    # ddgs only ships a sync client, so keep the blocking HTTP call off the event loop
+    return await asyncio.to_thread(run_search)
+
+
 async def fetch_summary_from_duckduckgo(
     query: str, 
     is_test_mode: bool, 
@@ -132,53 +252,50 @@ async def fetch_summary_from_duckduckgo(
     # Pass the region string directly, including 'wt-wt' if that's the input
     region_param_for_api = region 
 
+    cache_window = (time_limit or "any").lower()
+    cache_key = hashlib.sha256(f"{query.lower().strip()}|{region}|{cache_window}".encode("utf-8")).hexdigest()
+    cache_ttl = SEARCH_CACHE_TTL_SECONDS.get(cache_window, SEARCH_CACHE_TTL_SECONDS["any"])
+    cache_store = await open_search_cache()
+    cached = await cache_store.get_value(cache_key)
+    if cached and time.time() - cached.get("ts", 0) < cache_ttl:
+        Actor.log.info(f"Using cached DuckDuckGo summary for: {query[:60]}...")
+        return cached["summary"], cached["sources"]
+
     Actor.log.info(f"Searching DuckDuckGo News (Region: {region_param_for_api or 'any'}, Time: {time_param_for_api or 'any'}) for: {query[:60]}...")
     
     try:
-        def run_langchain_search():
-            # --- Pass parameters directly to the wrapper ---
-            wrapper = DuckDuckGoSearchAPIWrapper(
-                region=region_param_for_api, 
-                time=time_param_for_api, 
-                max_results=20 # <-- Increased from 10 to 20 to get more snippets
-            )
-            search_tool = DuckDuckGoSearchResults(
-                api_wrapper=wrapper, 
-                output_format="list",
-                backend="news" 
-            )
-            return search_tool.invoke(query)
-
-        search_results = await asyncio.to_thread(run_langchain_search)
+        search_results = await search_ddg_news(query, region_param_for_api, time_param_for_api)
 
     except Exception as e:
         # Log the specific exception type and message for better debugging
-        Actor.log.error(f"An unexpected error occurred during DuckDuckGo (LangChain) search ({type(e).__name__}): {e}")
+        Actor.log.error(f"An unexpected error occurred during DuckDuckGo search ({type(e).__name__}): {e}")
         return "", []
 
     if not search_results:
-        Actor.log.warning("DuckDuckGo (LangChain) search returned no items.")
+        Actor.log.warning("DuckDuckGo search returned no items.")
         return "", []
 
     # --- Build prompt and sources list (no changes) ---
     snippets_for_prompt = "\n---\n".join(
-        [f"Source: {item.get('source', 'Unknown')}\nDate: {item.get('date', 'N/A')}\nTitle: {item.get('title', 'N/A')}\nSnippet: {item.get('snippet', '')}" 
-         for item in search_results if item.get('snippet')]
+        [f"Source: {item.get('source', 'Unknown')}\nDate: {item.get('date', 'N/A')}\nTitle: {item.get('title', 'N/A')}\nSnippet: {item.get('body', '')}" 
+         for item in search_results if item.get('body')]
     )
     
     snippet_sources_list = [
         {
             "title": item.get('title', 'Unknown'), 
-            "url": item.get('link', 'N/A'),
+            "url": item.get('url', 'N/A'),
             "source": item.get('source', 'Unknown'),
             "date": item.get('date', 'N/A')
         } 
-        for item in search_results if item.get('snippet')
+        for item in search_results if item.get('body')
     ]
 
     Actor.log.info(f"Collected {len(snippet_sources_list)} snippets from DuckDuckGo News.")
     
     summary = await summarize_snippets_with_llm(snippets_for_prompt, is_test_mode=False)
+    if summary:
+        await cache_store.set_value(cache_key, {"summary": summary, "sources": snippet_sources_list, "ts": time.time()})
     
     return summary, snippet_sources_list
 
@@ -194,12 +311,11 @@ async def analyze_article_summary(summary: str, is_test_mode: bool) -> Dict[str,
         Actor.log.warning("Summary too short for analysis. Skipping LLM call.")
         return {"sentiment": "N/A", "category": "N/A", "key_entities": []}
 
-    sentiment_options = ["High Risk", "Medium Risk", "Low Risk/Informational"]
-    category_list_str = ", ".join(CATEGORIES)
-    prompt = f'Analyze the following Cybersecurity news summary: "{summary}"\n\nBased ONLY on the summary, provide a structured JSON output with:\n1. sentiment: The risk/impact level ({", ".join(sentiment_options)}).\n2. category: The best category from this list: {category_list_str}.\n3. key_entities: A list of up to 3 key companies, groups, or vulnerabilities.\n\nOutput a single valid JSON object.'
+    prompt = f'Analyze the following Cybersecurity news summary: "{summary}"\n\nBased ONLY on the summary, provide a structured JSON output with:\n1. sentiment: The risk/impact level ({SENTIMENT_LIST_STR}).\n2. category: The best category from this list: {CATEGORY_LIST_STR}.\n3. key_entities: A list of up to 3 key companies, groups, or vulnerabilities.\n\nOutput a single valid JSON object.'
 
     try:
-        response = client.chat.completions.create(
+        output_text = complete_chat(
+            client,
             model="gpt-3.5-turbo-0125",
             messages=[
                 {"role": "system", "content": "You are a professional Cybersecurity analyst. Return a JSON object with 'sentiment', 'category', and 'key_entities'."},
@@ -208,12 +324,11 @@ async def analyze_article_summary(summary: str, is_test_mode: bool) -> Dict[str,
             temperature=0.0,
             response_format={"type": "json_object"},
         )
-        output_text = response.choices[0].message.content.strip()
         parsed = json.loads(output_text)
         entities = parsed.get("key_entities", [])
         if not isinstance(entities, list): entities = [str(entities)] if entities else []
         sentiment = str(parsed.get("sentiment", "N/A")).strip()
-        if sentiment not in sentiment_options: sentiment = "Low Risk/Informational"
+        if sentiment not in SENTIMENT_SET: sentiment = "Low Risk/Informational"
         return {"sentiment": sentiment, "category": str(parsed.get("category", "N/A")).strip(), "key_entities": entities}
     except Exception as e:
         Actor.log.warning(f"LLM analysis failed: {e}")
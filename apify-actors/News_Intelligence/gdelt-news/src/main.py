@@ -1,9 +1,11 @@
 import asyncio
+import functools
 from apify import Actor
 from datetime import datetime, timezone
 import urllib.parse
-import json
-import aiohttp 
+import orjson
+import httpx
+from pydantic import HttpUrl, TypeAdapter, ValidationError
 import os
 import sys
 
@@ -11,9 +13,12 @@ import sys
 sys.path.append(os.path.dirname(__file__)) 
 
 # Absolute imports for internal modules
-from models import InputConfig, DatasetRecord
-from tools import fetch_summary_from_google, analyze_article_summary, extract_most_common_date_from_google
-from typing import List
+from models import InputConfig
+from tools import (
+    google_fetch, summarize_snippets_with_llm, analyze_article_summary,
+    run_analysis_batcher, extract_dates_from_items
+)
+from typing import Dict, List, Optional, Tuple
 
 # Define the base URL for the GDELT 2.0 DOC API
 GDELT_API_BASE_URL = "https://api.gdeltproject.org/api/v2/doc/doc"
@@ -22,6 +27,7 @@ GDELT_API_BASE_URL = "https://api.gdeltproject.org/api/v2/doc/doc"
 ## GDELT URL and Fetching Utilities
 ## ---------------------------
 
+@functools.lru_cache(maxsize=1024)
 def format_datetime(dt_str: str, default_ts: str = "000000") -> str | None:
     """
     Formats a date string into GDELT's YYYYMMDDHHMMSS format.
@@ -44,6 +50,7 @@ def format_datetime(dt_str: str, default_ts: str = "000000") -> str | None:
         
     return None
 
+@functools.lru_cache(maxsize=1024)
 def convert_gdelt_date_to_iso(gdelt_date: str) -> str:
     """
     Converts GDELT's YYYYMMDDHHMMSS format to a timezone-aware ISO 8601 string.
@@ -60,6 +67,30 @@ def convert_gdelt_date_to_iso(gdelt_date: str) -> str:
             return "N/A"
     return "N/A"
 
+# GDELT dates look like 20251016T090000Z; deleting 'T' and 'Z' yields YYYYMMDDHHMMSS
+_GDELT_STRIP = str.maketrans('', '', 'TZ')
+
+@functools.lru_cache(maxsize=256)
+def _netloc_of(url: str) -> str:
+    """
+    Returns the host part of a URL without a leading 'www.' ("" if there is none).
+    A plain string scan; avoids building a full urlparse() ParseResult per article.
+    """
+    start = url.find('://')
+    if start == -1:
+        return ""
+    start += 3
+    end = len(url)
+    for sep in '/?#':
+        pos = url.find(sep, start)
+        if pos != -1 and pos < end:
+            end = pos
+    netloc = url[start:end]
+    at = netloc.rfind('@')
+    if at != -1:
+        netloc = netloc[at + 1:]
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
 def build_gdelt_url(input_data: dict) -> str:
     """
     Constructs the GDELT API URL from the actor's input data.
@@ -82,61 +113,202 @@ def build_gdelt_url(input_data: dict) -> str:
 
     final_gdelt_query = ' '.join(final_query_parts)
 
-    params = {
-        'mode': 'artlist', 
-        'format': 'json',   
-        'query': final_gdelt_query 
-    }
+    # Only free-text values need quoting; the fixed keys and digit-only dates are URL-safe
+    query_string = f"mode=artlist&format=json&query={urllib.parse.quote_plus(final_gdelt_query)}"
 
     if input_data.get('max_records_limit'):
-        params['maxrecords'] = input_data['max_records_limit']
+        query_string += f"&maxrecords={input_data['max_records_limit']}"
     
     if input_data.get('sort_by'):
-        params['sort'] = input_data['sort_by']
+        query_string += f"&sort={urllib.parse.quote_plus(str(input_data['sort_by']))}"
 
     # Handle time range (relative offset takes precedence over absolute dates)
     if input_data.get('timespan_offset'):
-        params['timespan'] = input_data['timespan_offset']
+        query_string += f"&timespan={urllib.parse.quote_plus(str(input_data['timespan_offset']))}"
     else:
         start_dt = format_datetime(input_data.get('start_datetime'), '000000')
         end_dt = format_datetime(input_data.get('end_datetime'), '235959')
         if start_dt:
-            params['startdatetime'] = start_dt
+            query_string += f"&startdatetime={start_dt}"
         if end_dt:
-            params['enddatetime'] = end_dt
+            query_string += f"&enddatetime={end_dt}"
 
-    return f"{GDELT_API_BASE_URL}?{urllib.parse.urlencode(params)}"
+    return f"{GDELT_API_BASE_URL}?{query_string}"
 
-async def fetch_gdelt_articles(gdelt_url: str) -> List[dict]:
+async def fetch_gdelt_articles(gdelt_url: str, client: httpx.AsyncClient) -> List[dict]:
     """
     Fetches raw article data from the GDELT API with a timeout and robust error handling.
     """
-    timeout = aiohttp.ClientTimeout(total=120)  # 2-minute total timeout
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(gdelt_url) as gdelt_response:
-                gdelt_response.raise_for_status()
-                try:
-                    # Use content_type=None to handle potential GDELT API header issues
-                    gdelt_data = await gdelt_response.json(content_type=None)
-                except json.JSONDecodeError:
-                    response_text = await gdelt_response.text()
-                    Actor.log.error(f"GDELT API returned a non-JSON response. Response text: {response_text[:500]}")
-                    return []
-                
-                if gdelt_data and gdelt_data.get('error'):
-                    Actor.log.error(f"GDELT API returned a known error: {gdelt_data.get('error')}")
-                    return []
-                
-                return gdelt_data.get('articles', []) if gdelt_data else []
-
-    except asyncio.TimeoutError:
+        gdelt_response = await client.get(gdelt_url, timeout=120.0)  # 2-minute timeout
+        gdelt_response.raise_for_status()
+        # Parse the raw body once, regardless of the content-type header GDELT sends
+        raw = gdelt_response.content
+        try:
+            gdelt_data = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            Actor.log.error(f"GDELT API returned a non-JSON response. Response body: {raw[:500]!r}")
+            return []
+
+        if gdelt_data and gdelt_data.get('error'):
+            Actor.log.error(f"GDELT API returned a known error: {gdelt_data.get('error')}")
+            return []
+
+        return gdelt_data.get('articles', []) if gdelt_data else []
+
+    except httpx.TimeoutException:
         Actor.log.error("GDELT API request timed out after 120 seconds.")
         return []
-    except aiohttp.ClientError as e:
+    except httpx.HTTPError as e:
         Actor.log.error(f"An HTTP error occurred while fetching from GDELT: {e}")
         return []
 
+## ---------------------------
+## Per-Article Enrichment
+## ---------------------------
+
+# Maximum number of articles enriched (Google CSE + OpenAI) at the same time
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "10"))
+# Number of enriched records sent per Actor.push_data call
+PUSH_BATCH_SIZE = 50
+
+# Record URLs are plain strings; each push batch is validated with this one compiled adapter
+_URL_LIST_ADAPTER = TypeAdapter(List[HttpUrl])
+
+def drop_invalid_urls(batch: List[dict]) -> List[dict]:
+    """Validates all URLs of `batch` in a single pass and drops the records whose URL is invalid."""
+    try:
+        _URL_LIST_ADAPTER.validate_python([record["url"] for record in batch])
+        return batch
+    except ValidationError as e:
+        invalid = {error["loc"][0] for error in e.errors()}
+        Actor.log.warning(f"Dropping {len(invalid)} record(s) with an invalid URL.")
+        return [record for i, record in enumerate(batch) if i not in invalid]
+
+async def push_records_in_batches(queue: asyncio.Queue) -> None:
+    """
+    Drains enriched records from `queue` and pushes them to the dataset in batches.
+    A `None` item signals the end of the run and flushes the remainder.
+    """
+    batch: List[dict] = []
+    while (record := await queue.get()) is not None:
+        batch.append(record)
+        if len(batch) >= PUSH_BATCH_SIZE:
+            batch = drop_invalid_urls(batch)
+            if batch:
+                await Actor.push_data(batch)
+                Actor.log.info(f"Pushed batch of {len(batch)} ENRICHED records to dataset.")
+            batch = []
+
+    batch = drop_invalid_urls(batch) if batch else batch
+    if batch:
+        await Actor.push_data(batch)
+        Actor.log.info(f"Pushed final batch of {len(batch)} ENRICHED records to dataset.")
+
+async def enrich_query(
+    query: str,
+    client: httpx.AsyncClient,
+    config: InputConfig,
+    analysis_queue: asyncio.Queue
+) -> Tuple[List[dict], str, Optional[dict]]:
+    """
+    Runs the paid part of the enrichment for one query: a single Google CSE lookup,
+    the AI Overview summary and, when a summary exists, the (batched) LLM analysis.
+    """
+    # One Google CSE request feeds both the date fallback and the AI Overview
+    search_items = (await google_fetch(query, config.runTestMode, client)).get("items", [])
+    ai_overview = await summarize_snippets_with_llm(search_items, config.runTestMode)
+    analysis_results = await analyze_article_summary(ai_overview, analysis_queue) if ai_overview else None
+    return search_items, ai_overview, analysis_results
+
+async def enrich_one(
+    article_data: dict,
+    index: int,
+    total_articles: int,
+    sem: asyncio.Semaphore,
+    client: httpx.AsyncClient,
+    config: InputConfig,
+    records: asyncio.Queue,
+    summary_cache: Dict[str, asyncio.Task],
+    analysis_queue: asyncio.Queue
+) -> None:
+    """
+    Enriches a single GDELT record and queues it for the batched dataset push.
+    The caller acquires `sem` before scheduling this task; it is released here when done.
+    """
+    try:
+        url = article_data.get("url", "N/A")
+        title = article_data.get("title", "Unknown Title")
+
+        # Always derive the source from the URL for consistency and accuracy.
+        source = _netloc_of(url) or "N/A"
+
+        query_for_enrichment = f"{title} {source}"
+
+        Actor.log.info(f"Processing article {index}/{total_articles}: {title[:50]}...")
+
+        # Near-duplicate GDELT records share (title, source); reuse their search + LLM results.
+        # Caching the task (not its result) lets concurrent duplicates await the same calls.
+        enrichment = summary_cache.get(query_for_enrichment)
+        if enrichment is None:
+            enrichment = asyncio.create_task(enrich_query(query_for_enrichment, client, config, analysis_queue))
+            summary_cache[query_for_enrichment] = enrichment
+        else:
+            Actor.log.info(f"Reusing enrichment results for duplicate query '{query_for_enrichment[:50]}...'.")
+
+        # --- Date Extraction with Fallback ---
+        # Plan A needs no network, so resolve it while the enrichment task is in flight
+        published = "N/A"
+        # Plan A: Try GDELT's 'date' or 'seendate' fields
+        raw_gdelt_date = article_data.get("date") or article_data.get("seendate")
+        if raw_gdelt_date:
+            cleaned_date = str(raw_gdelt_date).translate(_GDELT_STRIP)
+            iso_date = convert_gdelt_date_to_iso(cleaned_date)
+            if iso_date != "N/A":
+                published = iso_date
+
+        # The date fallback and the AI Overview share one Google CSE response (see enrich_query)
+        search_items, ai_overview, analysis_results = await enrichment
+
+        # Plan B: If GDELT date fails, use the Google Search results as a fallback
+        if published == "N/A":
+            Actor.log.info(f"GDELT date missing for '{title[:30]}...'. Mining Google results for a fallback date.")
+            google_date = extract_dates_from_items(search_items, config.runTestMode)
+            if google_date:
+                published = google_date
+                Actor.log.info(f"Found fallback date from Google: {published}")
+            else:
+                Actor.log.warning(f"Could not find a valid date from Google for '{title[:30]}...'.")
+
+        # --- Main Enrichment Results ---
+        summary_text = ai_overview or article_data.get('snippet', 'No summary available.')
+        article_sentiment, article_category, article_entities = "N/A", "N/A", []
+
+        if analysis_results:
+            article_sentiment = analysis_results.get("sentiment")
+            article_category = analysis_results.get("category")
+            article_entities = analysis_results.get("key_entities")
+        else:
+            Actor.log.warning(f"Failed to get AI Overview for '{title[:30]}...', skipping LLM analysis.")
+
+        # --- Save Enriched Record ---
+        # Plain dict in the DatasetRecord shape; skips a pydantic round-trip per record
+        dataset_record = {
+            "source": source,
+            "title": title,
+            "url": url,
+            "published": published,
+            "summary": summary_text,
+            "sentiment": article_sentiment,
+            "category": article_category,
+            "key_entities": article_entities,
+        }
+
+        await records.put(dataset_record)
+        Actor.log.info(f"Queued ENRICHED record for '{title[:50]}...'.")
+    finally:
+        sem.release()
+
 ## ---------------------------
 ## Main Actor Execution
 ## ---------------------------
@@ -160,89 +332,46 @@ async def main():
             if config.runTestMode:
                 Actor.log.warning("!!! ADMIN TEST MODE ACTIVE: Bypassing ALL EXTERNAL API costs. !!!")
 
-            # 1. RETRIEVE GDELT Data
-            gdelt_url = build_gdelt_url(input_data)
-            Actor.log.info(f"GDELT API URL: {gdelt_url}")
-            
-            gdelt_articles = await fetch_gdelt_articles(gdelt_url)
-            
-            if not gdelt_articles:
-                Actor.log.info("No articles retrieved from GDELT data source. Exiting.")
-                return
+            # One pooled keep-alive client for GDELT and every Google CSE lookup
+            async with httpx.AsyncClient(
+                timeout=30.0, http2=True, limits=httpx.Limits(max_keepalive_connections=50)
+            ) as client:
+                # 1. RETRIEVE GDELT Data
+                gdelt_url = build_gdelt_url(input_data)
+                Actor.log.info(f"GDELT API URL: {gdelt_url}")
 
-            Actor.log.info(f"Retrieved {len(gdelt_articles)} GDELT records for enrichment.")
-            
-            processed_count = 0
-            total_articles = len(gdelt_articles)
-            
-            # 2. ENRICHMENT LOOP
-            for article_data in gdelt_articles:
-                processed_count += 1
-                
-                url = article_data.get("url", "N/A")
-                title = article_data.get("title", "Unknown Title")
-                
-                # Always derive the source from the URL for consistency and accuracy.
-                source = "N/A" 
+                gdelt_articles = await fetch_gdelt_articles(gdelt_url, client)
+
+                if not gdelt_articles:
+                    Actor.log.info("No articles retrieved from GDELT data source. Exiting.")
+                    return
+
+                Actor.log.info(f"Retrieved {len(gdelt_articles)} GDELT records for enrichment.")
+
+                total_articles = len(gdelt_articles)
+
+                # 2. ENRICHMENT (bounded concurrency)
+                # Acquiring before create_task caps in-flight tasks, not just in-flight requests.
+                sem = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+                records: asyncio.Queue = asyncio.Queue()
+                summary_cache: Dict[str, asyncio.Task] = {}
+                analysis_queue: asyncio.Queue = asyncio.Queue()
+                pusher = asyncio.create_task(push_records_in_batches(records))
+                batcher = asyncio.create_task(run_analysis_batcher(analysis_queue, config.runTestMode))
                 try:
-                    parsed_url = urllib.parse.urlparse(url)
-                    if parsed_url.netloc:
-                        source = parsed_url.netloc.replace('www.', '')
-                except Exception as e:
-                    Actor.log.warning(f"Could not parse source from URL '{url}': {e}")
-                
-                query_for_enrichment = f"{title} {source}"
-
-                # --- Date Extraction with Fallback ---
-                published = "N/A"
-                # Plan A: Try GDELT's 'date' or 'seendate' fields
-                raw_gdelt_date = article_data.get("date") or article_data.get("seendate")
-                if raw_gdelt_date:
-                    cleaned_date = str(raw_gdelt_date).replace('T', '').replace('Z', '')
-                    iso_date = convert_gdelt_date_to_iso(cleaned_date)
-                    if iso_date != "N/A":
-                        published = iso_date
-
-                # Plan B: If GDELT date fails, use Google Search as a fallback
-                if published == "N/A":
-                    Actor.log.info(f"GDELT date missing for '{title[:30]}...'. Searching Google for a fallback date.")
-                    google_date = await extract_most_common_date_from_google(query_for_enrichment, config.runTestMode)
-                    if google_date:
-                        published = google_date
-                        Actor.log.info(f"Found fallback date from Google: {published}")
-                    else:
-                        Actor.log.warning(f"Could not find a valid date from Google for '{title[:30]}...'.")
-
-                # --- Main Enrichment Logic ---
-                Actor.log.info(f"Processing article {processed_count}/{total_articles}: {title[:50]}...")
-                
-                ai_overview = await fetch_summary_from_google(query_for_enrichment, config.runTestMode)
-                
-                summary_text = ai_overview or article_data.get('snippet', 'No summary available.')
-                article_sentiment, article_category, article_entities = "N/A", "N/A", []
-
-                if ai_overview:
-                    analysis_results = await analyze_article_summary(ai_overview, config.runTestMode)
-                    article_sentiment = analysis_results.get("sentiment")
-                    article_category = analysis_results.get("category")
-                    article_entities = analysis_results.get("key_entities")
-                else:
-                    Actor.log.warning(f"Failed to get AI Overview for '{title[:30]}...', skipping LLM analysis.")
-
-                # --- Save Enriched Record ---
-                dataset_record = DatasetRecord(
-                    source=source,
-                    title=title,
-                    url=url,
-                    published=published,
-                    summary=summary_text,
-                    sentiment=article_sentiment,
-                    category=article_category,
-                    key_entities=article_entities
-                ).model_dump()
-
-                await Actor.push_data([dataset_record])
-                Actor.log.info(f"Pushed ENRICHED record for '{title[:50]}...' to dataset.")
+                    async with asyncio.TaskGroup() as tg:
+                        for index, article_data in enumerate(gdelt_articles, start=1):
+                            await sem.acquire()
+                            tg.create_task(enrich_one(
+                                article_data, index, total_articles, sem, client, config,
+                                records, summary_cache, analysis_queue
+                            ))
+                finally:
+                    # Flush whatever was enriched, even if the task group failed
+                    await analysis_queue.put(None)
+                    await batcher
+                    await records.put(None)
+                    await pusher
 
             Actor.log.info("🎯 GDELT Data Enrichment Pipeline completed successfully!")
             
@@ -1,7 +1,7 @@
 # models.py (GDELT Enrichment Pipeline)
 
-from pydantic import BaseModel, HttpUrl, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -26,11 +26,28 @@ class InputConfig(BaseModel):
     runTestMode: bool = Field(False, description="Enables internal test mode to bypass Apify Actor calls.")
 
 
+# Risk levels the analysis model may assign
+Sentiment = Literal["High Risk", "Medium Risk", "Low Risk/Informational"]
+
+
+class AnalysisOut(BaseModel):
+    """Structured LLM analysis of one summary within a batch."""
+    id: int
+    sentiment: Sentiment
+    category: str
+    key_entities: List[str] = []
+
+
+class BatchAnalysisOut(BaseModel):
+    """Structured output schema for a batched analysis request."""
+    results: List[AnalysisOut]
+
+
 class DatasetRecord(BaseModel):
     """Final dataset record to push into Apify dataset."""
     source: Optional[str]
     title: str
-    url: HttpUrl
+    url: str = Field(..., description="Article URL; validated in bulk before each dataset push.")
     published: Optional[str] = Field(None, description="The publication date/time in ISO 8601 format.")
     summary: Optional[str] = Field(None, description="The AI Overview summary from Google Search.") 
     
@@ -1,27 +1,28 @@
-import feedparser
 import re
 import os 
 import httpx 
-from typing import List, Tuple, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Tuple, Dict, Any, Optional, get_args
 from apify import Actor
-from apify_client import ApifyClient
-from openai import OpenAI
-from models import DatasetRecord, InputConfig 
+from models import DatasetRecord, InputConfig, BatchAnalysisOut, Sentiment
 import json
+import orjson
 import asyncio
 from datetime import datetime, timezone
 from collections import Counter
-from dateutil.parser import parse as date_parse # For flexible date parsing
 
-# Initialize Apify Client
-def init_apify_client() -> ApifyClient:
-    """Initializes the Apify client."""
-    return ApifyClient()
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 # Initialize OpenAI
-def init_openai() -> OpenAI:
-    """Initializes the OpenAI client."""
-    return OpenAI()
+_openai_client: Optional["AsyncOpenAI"] = None
+
+def init_openai() -> "AsyncOpenAI":
+    """Returns the shared async OpenAI client, importing and creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI()
+    return _openai_client
 
 # Global categories for the model to choose from (Cybersecurity focused)
 CATEGORIES = [
@@ -30,34 +31,126 @@ CATEGORIES = [
     "IoT/Hardware", "General InfoSec"
 ]
 
-def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20) -> List[dict]:
-    """Fetch and parse RSS feed entries for the selected news sources (Cybersecurity News Feeds)."""
-    feed_map = {
-        "the-hacker-news": "https://feeds.feedburner.com/TheHackersNews",
-        "custom": custom_url
+# Static parts of the analysis prompt, built once at import time
+_SENTIMENT_OPTIONS = get_args(Sentiment)
+_SENTIMENT_LIST_STR = ", ".join(_SENTIMENT_OPTIONS)
+_CATEGORY_LIST_STR = ", ".join(CATEGORIES)
+_BATCH_PROMPT_TEMPLATE = """
+    Analyze each of the following Cybersecurity/Geopolitical news summaries independently.
+    The summaries are given as a JSON array of objects with an "id" and a "summary":
+    {items}
+
+    Based ONLY on each summary, provide the following analysis per item:
+    1.  **sentiment**: The overall risk/impact level. Must be one of: {sentiments}.
+    2.  **category**: The single best thematic category from this list: {cats}.
+    3.  **key_entities**: A list of up to 3 key companies, groups, or vulnerabilities (e.g., CVE-XXXX, APT42, Microsoft, Russia, China) explicitly named. If none are found, use an empty list: [].
+
+    Your entire output MUST be a single, valid JSON object of the form
+    {{"results": [{{"id": <id>, "sentiment": ..., "category": ..., "key_entities": [...]}}, ...]}}
+    with exactly one entry per input id.
+    """
+
+# Google CSE returns at most 10 results per request; one call serves both summary and date mining
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+GOOGLE_RESULTS_PER_QUERY = 10
+SUMMARY_SNIPPET_COUNT = 5
+
+# Snippet date fallback: "Mon D, YYYY" or "YYYY-MM-DD"
+_DATE_RE = re.compile(r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s\d{1,2},\s\d{4}|\d{4}-\d{2}-\d{2}\b')
+# The two formats _DATE_RE can yield, tried before falling back to dateutil
+_SNIPPET_DATE_FORMATS = ('%Y-%m-%d', '%b %d, %Y')
+
+def _parse_date_str(date_str: str) -> datetime:
+    """
+    Parses a metatag or snippet date. ISO-8601 and the snippet formats are handled with
+    the stdlib; only anything else goes through the (much slower) dateutil parser.
+    """
+    try:
+        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except ValueError:
+        pass
+    for fmt in _SNIPPET_DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+
+    # dateutil is only needed on this fallback path, keep it off the import-time critical path
+    from dateutil.parser import parse as date_parse
+    return date_parse(date_str)
+
+async def google_fetch(query: str, is_test_mode: bool, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """
+    Runs a single Google Custom Search request and returns the raw response ({"items": [...]}).
+    Implements retry logic for 403 errors to handle rate limits/intermittent service blocking.
+    """
+    if is_test_mode:
+        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing Google Search API call.")
+        return {"items": []}
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    cse_id = os.getenv("GOOGLE_CSE_ID")
+
+    if not api_key or not cse_id:
+        Actor.log.error("Google API Key or CSE ID is not set in environment variables. Aborting search.")
+        return {"items": []}
+
+    params = {
+        'key': api_key,
+        'cx': cse_id,
+        'q': query,
+        'num': GOOGLE_RESULTS_PER_QUERY
     }
-    urls = []
-    if source == "custom" and custom_url:
-        urls.append(custom_url)
-    elif source == "all":
-        urls = [url for key, url in feed_map.items() if key != "custom" and url is not None]
-    else:
-        selected = feed_map.get(source)
-        if selected:
-            urls.append(selected)
-
-    articles = []
     
-    if urls and not os.getenv("IS_GDELT_ENRICHMENT", False):
-        Actor.log.warning("RSS Feed fetching logic is complex and dependent on original models. Returning empty list.")
+    MAX_RETRIES = 3
     
-    return []
+    for attempt in range(MAX_RETRIES):
+        Actor.log.info(f"Searching Google via API for: {query[:60]}... (Attempt {attempt + 1}/{MAX_RETRIES})")
+        
+        try:
+            response = await client.get(GOOGLE_SEARCH_URL, params=params)
+            
+            # Check for 403 (Forbidden) error specifically
+            if response.status_code == 403:
+                if attempt < MAX_RETRIES - 1:
+                    # Exponential backoff: 2s, 4s, 8s delay
+                    delay = 2 ** (attempt + 1)
+                    Actor.log.warning(f"Google Search API blocked (403). Retrying in {delay}s...")
+                    await asyncio.sleep(delay)
+                    continue  # Go to next retry attempt
+                else:
+                    Actor.log.error(f"Google Search API blocked (403) after {MAX_RETRIES} attempts. Giving up on this article.")
+                    return {"items": []}
+            
+            response.raise_for_status() # Raise exception for other bad status codes (4xx, 5xx)
+            
+            search_results = orjson.loads(response.content)
+            if not search_results.get("items"):
+                Actor.log.warning("Google Search API returned no items.")
+                return {"items": []}
+            return search_results
+
+        except httpx.HTTPStatusError as e:
+            Actor.log.error(f"Google Search API request failed with status {e.response.status_code}: {e.response.text}")
+            return {"items": []}
+        except Exception as e:
+            Actor.log.error(f"An unexpected error occurred during Google Search API call: {e}")
+            return {"items": []}
 
-async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
+    return {"items": []}
+
+async def summarize_snippets_with_llm(items: List[Dict[str, Any]], is_test_mode: bool) -> str:
+    """Uses an LLM to synthesize a one-paragraph summary from Google search result items."""
     if is_test_mode:
         Actor.log.warning("ADMIN TEST MODE: Bypassing LLM summarization call.")
         return "This is a test summary generated from dummy search snippets about a recent cybersecurity or geopolitical event."
 
+    if not items:
+        return ""
+
+    snippets = "\n".join([f"- {item.get('snippet', '')}" for item in items[:SUMMARY_SNIPPET_COUNT]])
+    Actor.log.info(f"Collected {min(len(items), SUMMARY_SNIPPET_COUNT)} snippets from Google Search.")
+
     client = init_openai()
     prompt = f"""
     Based on the following raw search result snippets, synthesize a concise, neutral, one-paragraph summary of the main news event.
@@ -70,7 +163,7 @@ async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
     """
 
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-3.5-turbo-0125",
             messages=[
                 {"role": "system", "content": "You are a news summarization assistant. Your task is to generate a single, coherent paragraph summarizing the provided search result snippets."},
@@ -85,37 +178,22 @@ async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
         Actor.log.warning(f"LLM summarization failed: {e}")
         return ""
 
-async def extract_most_common_date_from_google(query: str, is_test_mode: bool) -> Optional[str]:
+def extract_dates_from_items(items: List[Dict[str, Any]], is_test_mode: bool) -> Optional[str]:
     """
-    Performs a Google search, extracts dates from the results, and returns the most common one.
+    Extracts dates from Google search result items and returns the most common one.
     It prioritizes structured metadata but falls back to parsing snippets.
     """
     if is_test_mode:
         Actor.log.warning("ADMIN TEST MODE: Bypassing Google Search for date extraction.")
         return datetime.now(timezone.utc).isoformat()
 
-    api_key = os.getenv("GOOGLE_API_KEY")
-    cse_id = os.getenv("GOOGLE_CSE_ID")
-
-    if not api_key or not cse_id:
-        Actor.log.error("Google API Key or CSE ID not set; cannot perform date extraction.")
+    if not items:
         return None
 
-    search_url = "https://www.googleapis.com/customsearch/v1"
-    params = {'key': api_key, 'cx': cse_id, 'q': query, 'num': 10}
-    
-    dates_found = []
+    # (day_key, iso_str) pairs: count by day, but keep the ISO form so the winner needn't be re-parsed
+    dates_found: List[Tuple[str, str]] = []
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(search_url, params=params)
-            response.raise_for_status()
-            search_results = response.json()
-
-        items = search_results.get("items", [])
-        if not items:
-            return None
-
         for item in items:
             date_str = None
             # 1. Prioritize structured data (pagemap metadata)
@@ -130,18 +208,16 @@ async def extract_most_common_date_from_google(query: str, is_test_mode: bool) -
             
             # 2. Fallback to parsing the snippet text
             if not date_str:
-                # Regex for YYYY-MM-DD or common text dates
-                match = re.search(r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s\d{1,2},\s\d{4}|\d{4}-\d{2}-\d{2}\b', item.get('snippet', ''))
+                match = _DATE_RE.search(item.get('snippet', ''))
                 if match:
                     date_str = match.group(0)
 
             # 3. Parse the string into a datetime object
             if date_str:
                 try:
-                    # Use dateutil.parser to handle various formats
-                    parsed_date = date_parse(date_str).replace(tzinfo=timezone.utc)
+                    parsed_date = _parse_date_str(date_str).replace(tzinfo=timezone.utc)
                     # Normalize to just the date part for accurate counting
-                    dates_found.append(parsed_date.strftime('%Y-%m-%d'))
+                    dates_found.append((parsed_date.strftime('%Y-%m-%d'), parsed_date.isoformat()))
                 except (ValueError, TypeError):
                     continue # Ignore strings that can't be parsed
 
@@ -149,134 +225,110 @@ async def extract_most_common_date_from_google(query: str, is_test_mode: bool) -
             return None
 
         # 4. Find the most common date
-        most_common_date_str = Counter(dates_found).most_common(1)[0][0]
-        # Return it in full ISO 8601 format for consistency
-        return datetime.strptime(most_common_date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc).isoformat()
+        most_common_day = Counter(day_key for day_key, _ in dates_found).most_common(1)[0][0]
+        # Return the first ISO 8601 timestamp seen for that day
+        return next(iso_str for day_key, iso_str in dates_found if day_key == most_common_day)
 
     except Exception as e:
         Actor.log.warning(f"An error occurred during Google date extraction: {e}")
         return None
 
-async def fetch_summary_from_google(query: str, is_test_mode: bool) -> str:
-    """
-    Runs a Google Search via API, collects snippets, and uses an LLM to generate a summary.
-    Implements retry logic for 403 errors to handle rate limits/intermittent service blocking.
-    """
-    if is_test_mode:
-        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing Google Search API call.")
-        return await summarize_snippets_with_llm("", is_test_mode=True)
-
-    api_key = os.getenv("GOOGLE_API_KEY")
-    cse_id = os.getenv("GOOGLE_CSE_ID")
+# Analyses are sent to the LLM in batches of up to ANALYSIS_BATCH_SIZE summaries per request.
+# The batcher waits at most ANALYSIS_BATCH_WAIT_SECONDS for a batch to fill before sending it.
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "8"))
+ANALYSIS_BATCH_WAIT_SECONDS = 0.5
 
-    if not api_key or not cse_id:
-        Actor.log.error("Google API Key or CSE ID is not set in environment variables. Aborting search.")
-        return ""
+# Structured outputs (response_format=<pydantic model>) need a model that supports json_schema
+ANALYSIS_MODEL = "gpt-4o-mini"
 
-    search_url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        'key': api_key,
-        'cx': cse_id,
-        'q': query,
-        'num': 5
-    }
-    
-    MAX_RETRIES = 3
-    
-    for attempt in range(MAX_RETRIES):
-        Actor.log.info(f"Searching Google via API for: {query[:60]}... (Attempt {attempt + 1}/{MAX_RETRIES})")
-        
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(search_url, params=params)
-                
-                # Check for 403 (Forbidden) error specifically
-                if response.status_code == 403:
-                    if attempt < MAX_RETRIES - 1:
-                        # Exponential backoff: 2s, 4s, 8s delay
-                        delay = 2 ** (attempt + 1)
-                        Actor.log.warning(f"Google Search API blocked (403). Retrying in {delay}s...")
-                        await asyncio.sleep(delay)
-                        continue  # Go to next retry attempt
-                    else:
-                        Actor.log.error(f"Google Search API blocked (403) after {MAX_RETRIES} attempts. Giving up on this article.")
-                        return ""
-                
-                response.raise_for_status() # Raise exception for other bad status codes (4xx, 5xx)
-                
-                search_results = response.json()
-
-            items = search_results.get("items", [])
-            if not items:
-                Actor.log.warning("Google Search API returned no items.")
-                return ""
-
-            snippets = "\n".join([f"- {item.get('snippet', '')}" for item in items])
-            Actor.log.info(f"Collected {len(items)} snippets from Google Search.")
-
-            return await summarize_snippets_with_llm(snippets, is_test_mode=False)
-
-        except httpx.HTTPStatusError as e:
-            Actor.log.error(f"Google Search API request failed with status {e.response.status_code}: {e.response.text}")
-            return ""
-        except Exception as e:
-            Actor.log.error(f"An unexpected error occurred during Google Search API call: {e}")
-            return ""
-
-    return ""
-
-async def analyze_article_summary(summary: str, is_test_mode: bool) -> Dict[str, Any]:
+async def analyze_batch(summaries: List[str], is_test_mode: bool) -> List[Dict[str, Any]]:
+    """
+    Analyzes several summaries with a single LLM call and returns one analysis per summary, in order.
+    Items missing from the model's answer (or a failed call) come back as "Error" analyses.
+    """
     if is_test_mode:
-        Actor.log.warning("ADMIN TEST MODE: Bypassing LLM analysis (Pay Point 2 cost skipped).")
-        return { "sentiment": "High Risk (TEST)", "category": "Threat Intelligence (TEST)", "key_entities": ["Google", "OpenAI", "Geopolitical Group X"] }
+        Actor.log.warning(f"ADMIN TEST MODE: Bypassing LLM analysis for {len(summaries)} summaries (Pay Point 2 cost skipped).")
+        return [{ "sentiment": "High Risk (TEST)", "category": "Threat Intelligence (TEST)", "key_entities": ["Google", "OpenAI", "Geopolitical Group X"] } for _ in summaries]
 
+    error_result = {"sentiment": "Error", "category": "Error", "key_entities": []}
     client = init_openai()
-    if not summary or len(summary) < 20:
-        Actor.log.warning("Summary too short for analysis. Skipping LLM call.")
-        return {"sentiment": "N/A", "category": "N/A", "key_entities": []}
-
-    sentiment_options = ["High Risk", "Medium Risk", "Low Risk/Informational"]
-    category_list_str = ", ".join(CATEGORIES)
-    prompt = f"""
-    Analyze the following Cybersecurity/Geopolitical news summary: "{summary}"
-
-    Based ONLY on the summary, provide a structured JSON output with the following analysis:
-    1.  **sentiment**: The overall risk/impact level. Must be one of: {', '.join(sentiment_options)}.
-    2.  **category**: The single best thematic category from this list: {category_list_str}.
-    3.  **key_entities**: A list of up to 3 key companies, groups, or vulnerabilities (e.g., CVE-XXXX, APT42, Microsoft, Russia, China) explicitly named. If none are found, use an empty list: [].
-
-    Your entire output MUST be a single, valid JSON object matching the requested schema.
-    """
+    items = json.dumps([{"id": i, "summary": summary} for i, summary in enumerate(summaries)], ensure_ascii=False)
+    prompt = _BATCH_PROMPT_TEMPLATE.format(items=items, sentiments=_SENTIMENT_LIST_STR, cats=_CATEGORY_LIST_STR)
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
+        response = await client.beta.chat.completions.parse(
+            model=ANALYSIS_MODEL,
             messages=[
-                {"role": "system", "content": "You are a professional news analyst. You MUST return a single valid JSON object with keys: 'sentiment', 'category', and 'key_entities'. DO NOT include any other text or markdown outside of the JSON object."},
+                {"role": "system", "content": "You are a professional news analyst. Return exactly one analysis per input id."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0,
-            response_format={"type": "json_object"},
+            response_format=BatchAnalysisOut,
         )
-        output_text = response.choices[0].message.content.strip()
+        parsed = response.choices[0].message.parsed
         tokens = response.usage.total_tokens
         if tokens > 0:
-            Actor.log.info(f"Reporting {tokens} tokens used for combined analysis.")
+            Actor.log.info(f"Reporting {tokens} tokens used for batched analysis of {len(summaries)} summaries.")
             try:
                 Actor.push_actor_event( event_name='llm-analysis-tokens-used', event_data={'value': tokens} )
             except:
                 pass
-        
-        parsed = json.loads(output_text)
-        entities = parsed.get("key_entities", [])
-        if not isinstance(entities, list):
-             entities = [str(entities)] if entities else []
-        category = str(parsed.get("category", "N/A")).strip()
-        sentiment = str(parsed.get("sentiment", "N/A")).strip()
-        if sentiment not in sentiment_options:
-            sentiment = "Low Risk/Informational"
-            
-        return { "sentiment": sentiment, "category": category, "key_entities": entities }
-    
+
+        if parsed is None:
+            Actor.log.warning(f"Batched LLM analysis was refused: {response.choices[0].message.refusal}")
+            return [error_result for _ in summaries]
+
+        by_id = {entry.id: entry.model_dump(exclude={"id"}) for entry in parsed.results}
+        if len(by_id) < len(summaries):
+            Actor.log.warning(f"Batched LLM analysis returned {len(by_id)}/{len(summaries)} results.")
+        return [by_id.get(i, error_result) for i in range(len(summaries))]
+
     except Exception as e:
-        Actor.log.warning(f"Combined LLM analysis failed: {e}")
-        return {"sentiment": "Error", "category": "Error", "key_entities": []}
\ No newline at end of file
+        Actor.log.warning(f"Batched LLM analysis failed: {e}")
+        return [error_result for _ in summaries]
+
+async def run_analysis_batcher(queue: asyncio.Queue, is_test_mode: bool) -> None:
+    """
+    Consumer side of the batched analysis. Drains (summary, future) pairs from `queue`,
+    groups up to ANALYSIS_BATCH_SIZE of them and resolves each future with its analysis.
+    A `None` item signals that no more summaries will arrive.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+
+    async def dispatch(batch: List[Tuple[str, asyncio.Future]]) -> None:
+        results = await analyze_batch([summary for summary, _ in batch], is_test_mode)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    done = False
+    while not done and (item := await queue.get()) is not None:
+        batch = [item]
+        deadline = loop.time() + ANALYSIS_BATCH_WAIT_SECONDS
+        while len(batch) < ANALYSIS_BATCH_SIZE:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                done = True
+                break
+            batch.append(item)
+
+        # Send the batch without blocking the next one from filling up
+        task = asyncio.create_task(dispatch(batch))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+async def analyze_article_summary(summary: str, queue: asyncio.Queue) -> Dict[str, Any]:
+    """Producer side of the batched analysis: queues `summary` and waits for its analysis."""
+    if not summary or len(summary) < 20:
+        Actor.log.warning("Summary too short for analysis. Skipping LLM call.")
+        return {"sentiment": "N/A", "category": "N/A", "key_entities": []}
+
+    future = asyncio.get_running_loop().create_future()
+    await queue.put((summary, future))
+    return await future
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import logging
+
 from apify import Actor
 from langchain_core.messages import ToolMessage
 from typing import TypedDict, List, Dict, Any
@@ -28,6 +30,10 @@ def log_state(state: UtilsWorkflowState) -> None:
     Args:
         state: The state of the graph, containing a list of messages.
     """
+    # Nothing below is emitted unless debug logging is on (off in production runs)
+    if not Actor.log.isEnabledFor(logging.DEBUG):
+        return
+
     if 'messages' not in state or not state['messages']:
         Actor.log.debug("State has no messages to log.")
         return
@@ -38,7 +44,7 @@ def log_state(state: UtilsWorkflowState) -> None:
     # if multiple tools are called in parallel (showing tool results)
     if isinstance(message, ToolMessage):
         # Go backwards until the original message that triggered the tool call
-        for _message in state['messages'][::-1]:
+        for _message in reversed(state['messages']):
             if hasattr(_message, 'tool_calls'):
                 break
             Actor.log.debug('-------- Tool Result --------')
@@ -1,56 +1,82 @@
 from apify import Actor
-from langgraph.graph import StateGraph
-from typing import List, TypedDict, Any
+from typing import List
 import asyncio
-from .models import RSSFeed, Article, InputConfig, DatasetRecord
+import logging
+import os
+from .models import RSSFeed, Article, InputConfig
 from .tools import (
     fetch_rss_feeds,
     fetch_alpha_vantage_articles,
     analyze_article_summary,
-    generate_llm_summary
+    generate_llm_summary,
+    dedupe_articles,
+    fetch_grounding_snippets,
+    close_http_client
 )
 
 
-# ---------------------------
-# LangGraph Workflow State
-# ---------------------------
+# Maximum number of articles analyzed (Google CSE + Gemini) at the same time
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+# Maximum number of Google CSE grounding searches in flight; these run ahead of the LLM workers
+CSE_CONCURRENCY = int(os.getenv("CSE_CONCURRENCY", "10"))
+# Number of records sent per Actor.push_data call
+PUSH_BATCH_SIZE = 50
+
+
+async def buffer_record(record: dict, pending: List[dict], lock: asyncio.Lock) -> None:
+    """
+    Adds `record` to the shared `pending` buffer and pushes the buffer once it holds PUSH_BATCH_SIZE records.
+    The buffer is swapped out under `lock`; the push itself runs outside it.
+    """
+    async with lock:
+        pending.append(record)
+        if len(pending) < PUSH_BATCH_SIZE:
+            return
+        batch = pending[:]
+        pending.clear()
 
-class WorkflowState(TypedDict):
-    """Defines the state passed between nodes in the LangGraph workflow."""
-    config: InputConfig
-    all_articles: List[Article] # Combined list for processing
-    processed_count: int
+    await Actor.push_data(batch)
+    Actor.log.info(f"Pushed batch of {len(batch)} records to dataset.")
 
 
 # ---------------------------
-# Node Functions
+# Per-Article Processing
 # ---------------------------
 
-async def process_and_save_article(state: WorkflowState) -> dict:
+async def fetch_grounding_bounded(art: Article, is_test_mode: bool, sem: asyncio.Semaphore) -> str:
+    """Runs the Google CSE grounding search for `art`, at most CSE_CONCURRENCY at a time."""
+    async with sem:
+        return await fetch_grounding_snippets(art, is_test_mode)
+
+
+async def process_and_save_article(
+    art: Article,
+    grounding: asyncio.Task,
+    index: int,
+    total: int,
+    config: InputConfig,
+    pending: List[dict],
+    lock: asyncio.Lock
+) -> None:
     """
-    Processes the next article. Runs LLM analysis for all articles, then LLM summarization.
+    Processes a single article. Runs LLM analysis, then (optionally) LLM summarization,
+    and queues the record for the batched dataset push.
     """
-    all_articles = state["all_articles"]
-    config = state["config"]
-    processed_count = state["processed_count"]
-    
-    if processed_count >= len(all_articles):
-        Actor.log.info("No more articles to process.")
-        return {"processed_count": processed_count}
-
-
-    art = all_articles[processed_count]
-    
     # Initialize all fields with defaults
     article_sentiment = "N/A"
     article_category = "N/A"
     article_entities = []
     article_av_score = None
-    
-    Actor.log.info(f"Processing article {processed_count + 1} of {len(all_articles)} [Source: {art.source}]: {art.url}")
-    
+
+    # Lazy %-formatting: the HttpUrl is only stringified if INFO is actually emitted
+    if Actor.log.isEnabledFor(logging.INFO):
+        Actor.log.info("Processing article %d of %d [Source: %s]: %s", index, total, art.source, art.url)
+
     # 1. Get Analysis Data (LLM analysis for all articles, using Gemini grounding)
-    analysis_results = await analyze_article_summary(art, config.runTestMode)
+    # When summarization is on, the same Gemini call also returns the summary
+    analysis_results = await analyze_article_summary(
+        art, config.runTestMode, with_summary=config.useSummarization, grounding=grounding
+    )
     article_sentiment = analysis_results.get("sentiment")
     article_category = analysis_results.get("category")
     article_entities = analysis_results.get("key_entities")
@@ -59,10 +85,13 @@ async def process_and_save_article(state: WorkflowState) -> dict:
 
     # 2. Perform LLM Summarization (Pay Point 2 - Optional for all articles)
     final_summary = art.summary
-    
+
     if config.useSummarization:
-        llm_summary = await generate_llm_summary(art, config.runTestMode)
-        
+        llm_summary = analysis_results.get("summary")
+        if not llm_summary:
+            # Fallback: the fused analysis failed or returned no summary
+            llm_summary = await generate_llm_summary(art, config.runTestMode)
+
         if llm_summary and not llm_summary.startswith("LLM Summary Error"):
             final_summary = llm_summary
         else:
@@ -72,37 +101,45 @@ async def process_and_save_article(state: WorkflowState) -> dict:
 
     # Update article object with final summary
     art.summary = final_summary
-    
-    # 3. Save the single article immediately to the dataset
-    dataset_record = DatasetRecord(
-        source=art.source,
-        title=art.title,
-        url=art.url,
-        published=art.published,
-        summary=art.summary if art.summary else "No summary available (LLM skipped or failed).",
-        sentiment=article_sentiment,
-        category=article_category,
-        key_entities=article_entities,
-        gdelt_tone=article_av_score
-    ).model_dump() # <-- FIX: Changed .dict() to .model_dump() for Pydantic V2
-
-    Actor.log.info(f"Pushing record for {art.title[:50]}... to dataset. Analysis: {article_sentiment}, {article_category}")
-    await Actor.push_data([dataset_record])
-    
-    # 4. Update the processed count for the next iteration
-    return {"processed_count": processed_count + 1}
-
-
-def should_continue(state: WorkflowState) -> str:
-    """Conditional edge to check if more articles need processing."""
-    
-    all_articles = state.get("all_articles", [])
-    processed_count = state["processed_count"]
-    
-    if processed_count < len(all_articles):
-        return "continue"
-    else:
-        return "end"
+
+    # 3. Queue the record for the next batched dataset push
+    # Plain dict in the DatasetRecord shape; the only consumer is the dataset push
+    dataset_record = {
+        "source": art.source,
+        "title": art.title,
+        "url": str(art.url),
+        "published": art.published,
+        "summary": art.summary if art.summary else "No summary available (LLM skipped or failed).",
+        "sentiment": article_sentiment,
+        "category": article_category,
+        "key_entities": article_entities,
+        "gdelt_tone": article_av_score,
+    }
+
+    Actor.log.info("Queued record for %.50s... Analysis: %s, %s", art.title, article_sentiment, article_category)
+    await buffer_record(dataset_record, pending, lock)
+
+
+async def article_worker(
+    queue: asyncio.Queue,
+    total: int,
+    config: InputConfig,
+    pending: List[dict],
+    lock: asyncio.Lock
+) -> None:
+    """
+    Drains (index, article, grounding) items from `queue` until it is empty. LLM_CONCURRENCY
+    of these workers run side by side; one failed article is logged and does not stop the worker.
+    """
+    while True:
+        try:
+            index, art, grounding = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        try:
+            await process_and_save_article(art, grounding, index, total, config, pending, lock)
+        except Exception as e:
+            Actor.log.error("Failed to process article %s: %s", art.url, e)
 
 
 # ---------------------------
@@ -112,78 +149,79 @@ def should_continue(state: WorkflowState) -> str:
 async def main():
     """Main entrypoint for Apify actor execution."""
     async with Actor:
-        input_data = await Actor.get_input()
+        try:
+            input_data = await Actor.get_input()
         
-        config = InputConfig(**input_data)
-        Actor.log.info(f"Loaded config: {config}")
+            config = InputConfig(**input_data)
+            Actor.log.info(f"Loaded config: {config}")
         
-        if config.runTestMode:
-            Actor.log.warning("!!! ADMIN TEST MODE ACTIVE: Actor is bypassing ALL EXTERNAL API costs. !!!")
+            if config.runTestMode:
+                Actor.log.warning("!!! ADMIN TEST MODE ACTIVE: Actor is bypassing ALL EXTERNAL API costs. !!!")
 
         
-        # 1. Determine Fetch Strategy and Run Fetchers
-        Actor.log.info("Starting Parallel Data Fetch (RSS and Alpha Vantage).")
+            # 1. Determine Fetch Strategy and Run Fetchers
+            Actor.log.info("Starting Parallel Data Fetch (RSS and Alpha Vantage).")
         
-        is_av_only_mode = (config.source == "Alpha Vantage News")
+            is_av_only_mode = (config.source == "Alpha Vantage News")
         
-        rss_articles = []
-        av_task = None
-        
-        if not is_av_only_mode:
-            # Call synchronous RSS fetcher directly.
-            rss_articles = fetch_rss_feeds(
-                config.source, config.customFeedUrl, config.maxArticles
-            )
-        else:
-            Actor.log.info("Running in dedicated Alpha Vantage News mode. Skipping RSS feeds.")
+            rss_articles = []
+
+            # Start the AV fetcher first so it runs while the RSS feeds download
+            av_task = asyncio.create_task(fetch_alpha_vantage_articles(
+                config.source, config.maxArticles, config.runTestMode
+            ))
         
-        # Call AV fetcher as an asynchronous task
-        av_task = asyncio.create_task(fetch_alpha_vantage_articles(
-            config.source, config.maxArticles, config.runTestMode
-        ))
+            if not is_av_only_mode:
+                rss_articles = await fetch_rss_feeds(
+                    config.source, config.customFeedUrl, config.maxArticles
+                )
+            else:
+                Actor.log.info("Running in dedicated Alpha Vantage News mode. Skipping RSS feeds.")
         
-        # Wait for the AV task to complete
-        av_articles = await av_task
+            # Wait for the AV task to complete
+            av_articles = await av_task
         
-        # Combine articles into one list
-        all_articles = rss_articles + av_articles
+            # Combine articles into one list, dropping stories syndicated across feeds
+            all_articles = dedupe_articles(rss_articles + av_articles)
         
-        Actor.log.info(f"Combined {len(rss_articles)} RSS articles and {len(av_articles)} AV articles for a total of {len(all_articles)} articles to process.")
+            Actor.log.info(f"Combined {len(rss_articles)} RSS articles and {len(av_articles)} AV articles for a total of {len(all_articles)} articles to process.")
         
-        if not all_articles:
-            Actor.log.warning("No articles collected from any source. Finishing pipeline.")
-            return
+            if not all_articles:
+                Actor.log.warning("No articles collected from any source. Finishing pipeline.")
+                return
             
-        # 2. Setup LangGraph for Iterative Processing Loop
-        graph = StateGraph(WorkflowState)
-        graph.add_node("ProcessAndSaveArticle", process_and_save_article)
-        graph.set_entry_point("ProcessAndSaveArticle")
-        
-        graph.add_conditional_edges(
-            "ProcessAndSaveArticle",
-            should_continue,
-            {"continue": "ProcessAndSaveArticle", "end": "__end__"}
-        )
-
-        app = graph.compile()
-        
-        Actor.log.info("Starting iterative processing loop (Gemini Analysis/Summarization).")
-        
-        # Initial state for the loop contains the combined articles
-        initial_state = {
-            "config": config,
-            "all_articles": all_articles,
-            "processed_count": 0
-        }
-        
-        # <-- FIX: Set recursion limit dynamically based on max articles from both sources
-        # Add a small buffer to be safe.
-        max_total_articles = config.maxArticles * 2 + 5
-        recursion_config = {"recursion_limit": max_total_articles}
-
-        await app.ainvoke(initial_state, config=recursion_config)
-
-        Actor.log.info("🎯 Global Markets Intelligence pipeline completed successfully!")
+            # 2. Process all articles concurrently (bounded by LLM_CONCURRENCY)
+            Actor.log.info(f"Starting concurrent processing of {len(all_articles)} articles (Gemini Analysis/Summarization, concurrency={LLM_CONCURRENCY}).")
+
+            # Grounding searches start now for every article, so they are mostly finished
+            # by the time an article acquires an LLM slot (hides CSE latency behind Gemini).
+            cse_sem = asyncio.Semaphore(CSE_CONCURRENCY)
+            grounding_tasks = [
+                asyncio.create_task(fetch_grounding_bounded(art, config.runTestMode, cse_sem))
+                for art in all_articles
+            ]
+
+            # A fixed pool of LLM_CONCURRENCY workers drains the article queue
+            queue: asyncio.Queue = asyncio.Queue()
+            for index, (art, grounding) in enumerate(zip(all_articles, grounding_tasks), start=1):
+                queue.put_nowait((index, art, grounding))
+
+            pending: List[dict] = []
+            lock = asyncio.Lock()
+            total = len(all_articles)
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(min(LLM_CONCURRENCY, total)):
+                    tg.create_task(article_worker(queue, total, config, pending, lock))
+
+            # Flush the records left over from the last partial batch
+            if pending:
+                await Actor.push_data(pending)
+                Actor.log.info(f"Pushed final batch of {len(pending)} records to dataset.")
+
+            Actor.log.info("🎯 Global Markets Intelligence pipeline completed successfully!")
+
+        finally:
+            await close_http_client()
 
 
 if __name__ == "__main__":
@@ -1,31 +1,148 @@
-import feedparser
 import re
-from typing import List, Tuple, Dict, Any, Union
+from typing import TYPE_CHECKING, List, Tuple, Dict, Any, Union, Optional, Awaitable, Callable, TypeVar
 from apify import Actor
-from google import genai
-from google.genai import types
 from .models import Article
-import json
-from json.decoder import JSONDecodeError
+import orjson
 from collections import deque
-import requests
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import asyncio
 from urllib.parse import urlparse
 import urllib.parse
 import os
+import hashlib
+import random
+import time
+import functools
 from datetime import datetime, timedelta
 
+# feedparser and google-genai are imported on first use: AV-only runs never parse feeds
+# and test-mode runs never call Gemini, so neither should pay their import cost.
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+T = TypeVar("T")
+
 
 # Initialize Gemini client
-def init_gemini() -> genai.Client:
-    """Initializes the Google Gemini client using the GEMINI_API_KEY environment variable."""
+@functools.lru_cache(maxsize=1)
+def init_gemini() -> "genai.Client":
+    """
+    Initializes the Google Gemini client using the GEMINI_API_KEY environment variable.
+    The client is created once and shared, so its connection pool is reused across articles.
+    """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         Actor.log.error("GEMINI_API_KEY environment variable not set. Cannot initialize Gemini client.")
         raise ValueError("GEMINI_API_KEY environment variable is missing.")
+    from google import genai
     return genai.Client(api_key=api_key)
 
 
+# Shared async HTTP client for Alpha Vantage and Google CSE; closed at the end of main()
+_HTTP = httpx.AsyncClient(
+    timeout=10,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    # Retries failed connection attempts (not HTTP error responses)
+    transport=httpx.AsyncHTTPTransport(retries=2),
+)
+
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client and its pooled connections."""
+    await _HTTP.aclose()
+
+
+async def get_json(url: str, params: Dict[str, Any]) -> Any:
+    """GETs `url` with the shared client and returns the decoded JSON body; raises on HTTP errors."""
+    response = await _HTTP.get(url, params=params)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+# Transient failures (429, 5xx, dropped connections) are retried with jittered exponential backoff
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.4
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """True for rate limits, server errors and network failures from httpx or Gemini."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    if isinstance(exc, httpx.TransportError):
+        return True
+    from google.genai import errors
+    return isinstance(exc, errors.APIError) and (exc.code == 429 or (exc.code or 0) >= 500)
+
+
+async def with_retry(call: Callable[[], Awaitable[T]], tries: int = RETRY_ATTEMPTS, base: float = RETRY_BASE_DELAY) -> T:
+    """Awaits `call()`, retrying transient errors up to `tries` attempts in total."""
+    for attempt in range(tries):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == tries - 1 or not _is_transient_error(e):
+                raise
+            delay = base * (2 ** attempt) + random.random() * 0.1
+            Actor.log.warning("Transient error (%s); retrying in %.2fs (attempt %d/%d).", e, delay, attempt + 1, tries)
+            await asyncio.sleep(delay)
+
+
+# Gemini calls run at temperature=0, so a response is a function of (model, prompt).
+# Responses are cached in-process and in a named key-value store that survives across runs.
+GEMINI_CACHE_STORE_NAME = "gemini-response-cache"
+GEMINI_CACHE_TTL_SECONDS = 7 * 24 * 3600  # persisted entries older than this are regenerated
+_gemini_cache: Dict[str, str] = {}
+_gemini_cache_store = None
+
+
+async def open_gemini_cache():
+    """Opens (once per run) the key-value store holding cached Gemini responses."""
+    global _gemini_cache_store
+    if _gemini_cache_store is None:
+        _gemini_cache_store = await Actor.open_key_value_store(name=GEMINI_CACHE_STORE_NAME)
+    return _gemini_cache_store
+
+
+async def generate_content_cached(
+    client: "genai.Client",
+    model: str,
+    prompt: str,
+    config: "types.GenerateContentConfig",
+    validate: Optional[Callable[[str], Any]] = None
+) -> str:
+    """
+    Returns the stripped text of a Gemini response for `prompt`, reusing a cached response when one exists.
+    Only non-empty responses that pass `validate` (which raises on bad output) are cached.
+    """
+    cache_key = hashlib.sha256(orjson.dumps({"m": model, "p": prompt}, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    if cache_key in _gemini_cache:
+        return _gemini_cache[cache_key]
+
+    cache_store = await open_gemini_cache()
+    cached = await cache_store.get_value(cache_key)
+    if isinstance(cached, dict) and time.time() - cached.get("ts", 0) < GEMINI_CACHE_TTL_SECONDS:
+        Actor.log.info("Gemini: Using cached response.")
+        _gemini_cache[cache_key] = cached["text"]
+        return cached["text"]
+
+    response = await with_retry(lambda: client.aio.models.generate_content(
+        model=model,
+        contents=[{"role": "user", "parts": [{"text": prompt}]}],
+        config=config
+    ))
+    text = response.text.strip()
+    if text:
+        # A malformed reply raises here, before it is cached, so a later call retries it
+        if validate is not None:
+            validate(text)
+        _gemini_cache[cache_key] = text
+        await cache_store.set_value(cache_key, {"text": text, "ts": time.time()})
+    return text
+
+
 # Global categories for the model to choose from
 CATEGORIES = [
     "Monetary Policy", "Trade/Tariffs", "Market Data/Indices",
@@ -33,6 +150,40 @@ CATEGORIES = [
     "Commodities/Energy", "Geopolitical Risk"
 ]
 
+# Static parts of the extraction prompt, built once at import time. The per-article text goes
+# last so every request shares the same prompt prefix (eligible for Gemini's implicit prefix caching).
+SENTIMENT_OPTIONS = ("Positive", "Neutral", "Negative")
+CATEGORY_LIST_STR = ", ".join(CATEGORIES)
+_EXTRACTION_PROMPT_TEMPLATE = """
+    Analyze the text at the end of this prompt, derived from a real-time market search or article summary.
+    Based ONLY on that text, generate a structured JSON object.
+
+    JSON Schema:
+    1.  **sentiment**: The overall market mood/tone (Positive, Neutral, or Negative).
+    2.  **category**: The single best thematic category from this list: {categories}.
+    3.  **key_entities**: A list of up to 3 key companies, people, or macroeconomic terms (e.g., 'Inflation', 'ECB', 'TSLA') mentioned.
+    4.  **numeric_score**: A single float between -10.0 (very negative) and +10.0 (very positive) reflecting market impact.
+    {summary_field}
+    Your entire output MUST be a single, valid JSON object.
+"""
+EXTRACTION_PROMPT_PREFIX = _EXTRACTION_PROMPT_TEMPLATE.format(categories=CATEGORY_LIST_STR, summary_field="")
+EXTRACTION_PROMPT_PREFIX_WITH_SUMMARY = _EXTRACTION_PROMPT_TEMPLATE.format(
+    categories=CATEGORY_LIST_STR,
+    summary_field="5.  **summary**: A concise, one-paragraph summary of the text, focusing on the main financial, market, or policy implications.\n"
+)
+
+# Input budgets for the LLM context (~4 chars per token); input tokens dominate these short-output calls
+GROUNDING_RESULTS = 3
+SNIPPET_MAX_CHARS = 300
+ANALYSIS_CONTEXT_MAX_CHARS = 1200
+SUMMARY_CONTEXT_MAX_CHARS = 800
+
+
+def _clip(text: str | None, limit: int) -> str | None:
+    """Truncates `text` to at most `limit` characters (None passes through)."""
+    return text if text is None else text[:limit]
+
+
 # Categorized Feed Map
 CATEGORIZED_FEEDS = {
     "World/General News": [
@@ -84,8 +235,58 @@ CATEGORIZED_FEEDS = {
 }
 
 
-def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20) -> List[Article]:
-    """Fetch and parse RSS feed entries."""
+# Every feed across all categories, deduplicated in a stable order (keeps ETag/request order identical across runs)
+_ALL_FEED_URLS = tuple(dict.fromkeys(url for category_list in CATEGORIZED_FEEDS.values() for url in category_list))
+
+# Number of feeds downloaded and parsed at the same time
+RSS_FETCH_WORKERS = 16
+
+
+# Feed validators (ETag/Last-Modified) and the last entries seen per feed, kept across runs
+FEED_CACHE_STORE_NAME = "rss-feed-cache"
+FEED_CACHE_KEY = "FEEDS"
+FEED_CACHE_MAX_ENTRIES = 50
+
+
+def _parse_feed(feed_url: str, cached: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    """
+    Downloads and parses one feed with a conditional GET against the cached validators.
+    Returns the feed's cache record ({"etag", "modified", "title", "entries"}); on 304 the
+    cached record is returned as is. Returns None (after logging) if the feed fails or is empty.
+    """
+    cached = cached or {}
+    try:
+        import feedparser
+        parsed = feedparser.parse(feed_url, etag=cached.get("etag"), modified=cached.get("modified"))
+    except Exception as e:
+        Actor.log.warning(f"Failed to parse feed {feed_url}: {e}")
+        return None
+
+    if parsed.get("status") == 304 and cached.get("entries"):
+        Actor.log.info("Feed not modified, using cached entries: %s", feed_url)
+        return cached
+    # Entries without a title or an http(s) link can't become Articles; drop them with a cheap check
+    valid_entries = list(islice(
+        (entry for entry in parsed.entries if entry.get("title") and entry.get("link", "").startswith("http")),
+        FEED_CACHE_MAX_ENTRIES
+    ))
+    if not valid_entries:
+        return None
+
+    return {
+        "etag": parsed.get("etag"),
+        "modified": parsed.get("modified"),
+        "title": parsed.feed.get("title", f"Unknown ({feed_url})"),
+        "entries": [
+            {"title": entry.get("title", ""), "link": entry.get("link", ""),
+             "published": entry.get("published"), "summary": entry.get("summary")}
+            for entry in valid_entries
+        ],
+    }
+
+
+async def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20) -> List[Article]:
+    """Fetch and parse RSS feed entries, skipping the download of feeds unchanged since the last run."""
     if source == "Alpha Vantage News":
         Actor.log.info("Dedicated Alpha Vantage mode selected. Skipping traditional RSS feed fetch.")
         return []
@@ -95,7 +296,7 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20)
     if source == "custom" and custom_url:
         urls = [custom_url]
     elif source == "all":
-        urls = list(set(url for category_list in CATEGORIZED_FEEDS.values() for url in category_list))
+        urls = _ALL_FEED_URLS
     elif source in CATEGORIZED_FEEDS:
         urls = CATEGORIZED_FEEDS[source]
     else:
@@ -104,15 +305,26 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20)
 
     Actor.log.info(f"Fetching articles from category: {category_name} ({len(urls)} feeds)")
 
+    cache_store = await Actor.open_key_value_store(name=FEED_CACHE_STORE_NAME)
+    feed_cache = await cache_store.get_value(FEED_CACHE_KEY) or {}
+
+    # feedparser does a blocking GET + parse per feed; run them in parallel threads
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=RSS_FETCH_WORKERS) as executor:
+        feeds = await asyncio.gather(*(
+            loop.run_in_executor(executor, _parse_feed, feed_url, feed_cache.get(feed_url))
+            for feed_url in urls
+        ))
+
+    # The round-robin takes about max_articles / len(urls) entries per feed; don't queue more than that (+2 slack)
+    per_feed_cap = max(1, max_articles // max(1, len(urls)) + 2)
+
     parsed_feeds = []
-    for feed_url in urls:
-        try:
-            parsed = feedparser.parse(feed_url)
-            if parsed.entries:
-                source_title = parsed.feed.get("title", f"Unknown ({feed_url})")
-                parsed_feeds.append((iter(parsed.entries), source_title))
-        except Exception as e:
-            Actor.log.warning(f"Failed to parse feed {feed_url}: {e}")
+    for feed_url, feed in zip(urls, feeds):
+        if feed is not None:
+            feed_cache[feed_url] = feed
+            parsed_feeds.append((islice(feed["entries"], per_feed_cap), feed["title"]))
+    await cache_store.set_value(FEED_CACHE_KEY, feed_cache)
 
     if not parsed_feeds:
         return []
@@ -123,7 +335,8 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20)
         entry_iterator, source_title = feed_queue.popleft()
         try:
             entry = next(entry_iterator)
-            article_item = Article(
+            # Trusted internal rows: skip pydantic validation on the hot path
+            article_item = Article.model_construct(
                 title=entry.get("title", ""),
                 url=entry.get("link", ""),
                 source=source_title,
@@ -141,6 +354,54 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20)
     return articles
 
 
+def _canonical_url(url: str) -> str:
+    """Host (without 'www.') plus path, so tracking params and trailing slashes don't defeat dedup."""
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    return netloc + parsed.path.rstrip('/')
+
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def _title_shingles(title: str) -> set:
+    """Character 4-gram shingles of the normalized title."""
+    text = " ".join(_WORD_RE.findall(title.lower()))
+    return {text[i:i + 4] for i in range(max(len(text) - 3, 1))} if text else set()
+
+
+def dedupe_articles(articles: List[Article], similarity_threshold: float = 0.85) -> List[Article]:
+    """
+    Drops cross-syndicated duplicates before any LLM work: first by canonical URL,
+    then by Jaccard similarity of title shingles. The first occurrence is kept.
+    """
+    seen_urls: set = set()
+    kept: List[Article] = []
+    kept_shingles: List[set] = []
+
+    for article in articles:
+        url_key = _canonical_url(str(article.url))
+        if url_key in seen_urls:
+            continue
+
+        shingles = _title_shingles(article.title)
+        if shingles and any(
+            seen and len(shingles & seen) / len(shingles | seen) > similarity_threshold
+            for seen in kept_shingles
+        ):
+            continue
+
+        seen_urls.add(url_key)
+        kept.append(article)
+        kept_shingles.append(shingles)
+
+    if articles:
+        Actor.log.info(f"Deduplicated {len(articles)} articles to {len(kept)} ({1 - len(kept) / len(articles):.0%} removed).")
+    return kept
+
+
 async def fetch_alpha_vantage_articles(source_topic: str, max_articles: int, is_test_mode: bool) -> List[Article]:
     """Fetches latest financial news directly from the Alpha Vantage NEWS_SENTIMENT API."""
     if is_test_mode:
@@ -173,9 +434,7 @@ async def fetch_alpha_vantage_articles(source_topic: str, max_articles: int, is_
     
     Actor.log.info(f"Fetching Alpha Vantage articles for topic: {av_topic}")
     try:
-        response = requests.get(AV_API_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = await with_retry(lambda: get_json(AV_API_URL, params))
         
         if "Error Message" in data:
             Actor.log.error(f"Alpha Vantage API returned error: {data['Error Message']}")
@@ -183,7 +442,9 @@ async def fetch_alpha_vantage_articles(source_topic: str, max_articles: int, is_
         
         articles = []
         for item in data.get("feed", []):
-            articles.append(Article(
+            if not item.get("url", "").startswith("http"):
+                continue
+            articles.append(Article.model_construct(
                 title=item.get("title", "No Title"), url=item.get("url", ""),
                 source=item.get("source", "Alpha Vantage"), published=item.get("time_published"),
                 summary=item.get("summary")
@@ -191,20 +452,19 @@ async def fetch_alpha_vantage_articles(source_topic: str, max_articles: int, is_
         
         Actor.log.info(f"Collected {len(articles)} articles directly from Alpha Vantage.")
         return articles
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
         Actor.log.error(f"Alpha Vantage API request failed: {e}")
         return []
 
 
-async def analyze_article_summary(article: Article, is_test_mode: bool) -> Dict[str, Any]:
+async def fetch_grounding_snippets(article: Article, is_test_mode: bool) -> str:
     """
-    Performs LLM analysis using Google Programmable Search for grounding, then Gemini for structured output.
+    Grounding with Google Programmable Search: returns the result snippets for the article
+    as a bullet list, or "" when search is unavailable or finds nothing.
     """
     if is_test_mode:
-        Actor.log.warning("ADMIN TEST MODE: Bypassing external APIs for analysis.")
-        return {"sentiment": "Neutral (TEST)", "category": "Market Data/Indices (TEST)", "key_entities": ["Powell", "Interest Rates"], "gdelt_tone": 0.0}
+        return ""
 
-    # --- STEP 1: Grounding with Google Programmable Search ---
     search_snippets = ""
     api_key = os.getenv("GOOGLE_API_KEY")
     cse_id = os.getenv("GOOGLE_CSE_ID")
@@ -213,68 +473,80 @@ async def analyze_article_summary(article: Article, is_test_mode: bool) -> Dict[
     if not api_key or not cse_id:
         Actor.log.warning("Google API Key or CSE ID not set in environment variables. Skipping search grounding.")
     else:
-        Actor.log.info(f"Searching Google for grounding context: {search_query[:70]}...")
+        Actor.log.info("Searching Google for grounding context: %.70s...", search_query)
         search_url = "https://www.googleapis.com/customsearch/v1"
-        params = {'key': api_key, 'cx': cse_id, 'q': search_query, 'num': 5}
+        params = {'key': api_key, 'cx': cse_id, 'q': search_query, 'num': GROUNDING_RESULTS}
         
         try:
-            # Using requests for this synchronous call
-            response = requests.get(search_url, params=params, timeout=10)
-            response.raise_for_status()
-            search_results = response.json()
+            search_results = await with_retry(lambda: get_json(search_url, params))
             items = search_results.get("items", [])
             if items:
-                search_snippets = "\n".join([f"- {item.get('snippet', '')}" for item in items])
-                Actor.log.info(f"Collected {len(items)} snippets from Google Search for grounding.")
-        except requests.RequestException as e:
-            Actor.log.warning(f"Google Search API call failed: {e}")
+                search_snippets = "\n".join([f"- {_clip(item.get('snippet', ''), SNIPPET_MAX_CHARS)}" for item in items])
+                Actor.log.info("Collected %d snippets from Google Search for grounding.", len(items))
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+            Actor.log.warning("Google Search API call failed: %s", e)
+
+    return search_snippets
+
+
+async def analyze_article_summary(
+    article: Article,
+    is_test_mode: bool,
+    with_summary: bool = False,
+    grounding: Optional[Awaitable[str]] = None
+) -> Dict[str, Any]:
+    """
+    Performs LLM analysis using Google Programmable Search for grounding, then Gemini for structured output.
+    With `with_summary`, the same Gemini call also returns a one-paragraph `summary` of the context,
+    so summarization does not need a second round-trip.
+    `grounding` may be an already-running search (see fetch_grounding_snippets); otherwise the search runs here.
+    """
+    if is_test_mode:
+        Actor.log.warning("ADMIN TEST MODE: Bypassing external APIs for analysis.")
+        test_result = {"sentiment": "Neutral (TEST)", "category": "Market Data/Indices (TEST)", "key_entities": ["Powell", "Interest Rates"], "gdelt_tone": 0.0}
+        if with_summary:
+            test_result["summary"] = f"TEST MODE SUMMARY: Summary for {article.title}."
+        return test_result
+
+    # --- STEP 1: Grounding with Google Programmable Search ---
+    search_snippets = await (grounding if grounding is not None else fetch_grounding_snippets(article, is_test_mode))
 
     # --- STEP 2: Structure Extraction with Gemini ---
     try:
         client = init_gemini()
     except ValueError:
         return {"sentiment": "Error", "category": "Error", "key_entities": [], "gdelt_tone": None}
+    from google.genai import types
 
-    sentiment_options = ["Positive", "Neutral", "Negative"]
-    category_list_str = ", ".join(CATEGORIES)
-    
     # Use the collected snippets for better context, or fall back to the article's own summary.
-    context_for_analysis = search_snippets if search_snippets else (article.summary or article.title)
-
-    extraction_prompt = f"""
-    Analyze the following text derived from a real-time market search or article summary.
-    Based ONLY on the text provided below, generate a structured JSON object.
-
-    TEXT: "{context_for_analysis}"
-
-    JSON Schema:
-    1.  **sentiment**: The overall market mood/tone (Positive, Neutral, or Negative).
-    2.  **category**: The single best thematic category from this list: {category_list_str}.
-    3.  **key_entities**: A list of up to 3 key companies, people, or macroeconomic terms (e.g., 'Inflation', 'ECB', 'TSLA') mentioned.
-    4.  **numeric_score**: A single float between -10.0 (very negative) and +10.0 (very positive) reflecting market impact.
-
-    Your entire output MUST be a single, valid JSON object.
-    """
+    context_for_analysis = _clip(search_snippets if search_snippets else (article.summary or article.title), ANALYSIS_CONTEXT_MAX_CHARS)
+    prompt_prefix = EXTRACTION_PROMPT_PREFIX_WITH_SUMMARY if with_summary else EXTRACTION_PROMPT_PREFIX
+    extraction_prompt = f'{prompt_prefix}\n    TEXT: "{context_for_analysis}"\n'
     
     Actor.log.info("Gemini: Extracting structured analysis from provided context.")
     try:
-        extraction_response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=[{"role": "user", "parts": [{"text": extraction_prompt}]}],
-            config=types.GenerateContentConfig(
+        extraction_text = await generate_content_cached(
+            client,
+            'gemini-1.5-flash',
+            extraction_prompt,
+            types.GenerateContentConfig(
                 response_mime_type="application/json",
                 temperature=0.0
-            )
+            ),
+            validate=orjson.loads
         )
-        parsed = json.loads(extraction_response.text.strip())
+        parsed = orjson.loads(extraction_text)
         sentiment = str(parsed.get("sentiment", "Neutral")).strip()
         
-        return {
-            "sentiment": sentiment if sentiment in sentiment_options else "Neutral",
+        result = {
+            "sentiment": sentiment if sentiment in SENTIMENT_OPTIONS else "Neutral",
             "category": str(parsed.get("category", "N/A")).strip(),
             "key_entities": [str(e).strip() for e in parsed.get("key_entities", [])][:3],
             "gdelt_tone": float(parsed.get("numeric_score", 0.0))
         }
+        if with_summary:
+            result["summary"] = str(parsed.get("summary") or "").strip()
+        return result
     except Exception as e:
         Actor.log.warning(f"Gemini structure extraction failed: {e}")
         return {"sentiment": "Error", "category": "Error", "key_entities": [], "gdelt_tone": None}
@@ -286,12 +558,13 @@ async def generate_llm_summary(article: Article, is_test_mode: bool) -> str:
         Actor.log.warning("ADMIN TEST MODE: Bypassing LLM summarization.")
         return f"TEST MODE SUMMARY: Summary for {article.title}."
         
-    content_to_summarize = article.summary if article.summary else f"Title: {article.title}. Source: {article.source}."
+    content_to_summarize = _clip(article.summary, SUMMARY_CONTEXT_MAX_CHARS) if article.summary else f"Title: {article.title}. Source: {article.source}."
 
     try:
         client = init_gemini()
     except ValueError:
         return "LLM Summary Error: Gemini client initialization failed."
+    from google.genai import types
     
     prompt = f"""
     Create a concise, one-paragraph summary of the following news article context. Focus on the main financial, market, or policy implications.
@@ -300,12 +573,12 @@ async def generate_llm_summary(article: Article, is_test_mode: bool) -> str:
     """
 
     try:
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=[{"role": "user", "parts": [{"text": prompt}]}],
-            config=types.GenerateContentConfig(temperature=0.0)
+        return await generate_content_cached(
+            client,
+            'gemini-1.5-flash',
+            prompt,
+            types.GenerateContentConfig(temperature=0.0)
         )
-        return response.text.strip()
     except Exception as e:
         Actor.log.warning(f"LLM summarization failed: {e}")
         return f"LLM Summary Error: {article.title}"
\ No newline at end of file
@@ -1,115 +1,163 @@
 import os
 from apify import Actor
-from langgraph.graph import StateGraph
-from typing import List, TypedDict
+from typing import List, Tuple
 import asyncio
-import hashlib
-import re # Added for HTML stripping helper function
-from .models import RSSFeed, Article, InputConfig, DatasetRecord
-from .tools import fetch_rss_feeds, fetch_summary_from_duckduckgo, analyze_article_summary
+from array import array
+import xxhash
+from selectolax.lexbor import LexborHTMLParser
+from .models import RSSFeed, InputConfig, DatasetRecord
+from .tools import fetch_rss_feeds, fetch_snippets_from_duckduckgo, summarize_and_analyze, close_http_client
 from apify.storages import KeyValueStore
 
+# Maximum number of articles searched/analyzed (DuckDuckGo + OpenAI) at the same time
+ARTICLE_CONCURRENCY = int(os.getenv("ARTICLE_CONCURRENCY", "8"))
+# Number of records sent per Actor.push_data call
+PUSH_BATCH_SIZE = 50
+# Single store entry holding the xxh3_64 digests of all processed URLs as a packed uint64 array
+SEEN_BLOB_KEY = "seen_blob"
+
 # --- HELPER FUNCTION FOR CLEANING (ADDED) ---
 def strip_html_tags(text):
     """Removes HTML tags and cleans up extra whitespace."""
     if not text:
         return ""
-    # Remove HTML tags (simple regex)
-    clean = re.sub('<[^<]+?>', '', text)
-    # Remove excessive whitespace
-    clean = ' '.join(clean.split())
-    return clean
+    # selectolax tokenizes in linear time (no regex backtracking on malformed markup)
+    # and decodes entities; the separator keeps words from adjacent blocks apart
+    return ' '.join(LexborHTMLParser(text).text(separator=' ').split())
 # --------------------------------------------
 
-class WorkflowState(TypedDict):
-    config: InputConfig
-    articles: List[Article]
-    processed_count: int
-    processed_urls_store: KeyValueStore
+def _url_digest(link) -> int:
+    """64-bit digest under which a processed URL is recorded (non-cryptographic, dedupe only)."""
+    return xxhash.xxh3_64_intdigest(str(link).encode('utf-8'))
 
-async def rss_fetcher(state: WorkflowState) -> dict:
-    config = state["config"]
-    processed_urls_store = state["processed_urls_store"]
+async def load_processed_digests(processed_urls_store: KeyValueStore) -> set:
+    """Reads the digests of all already-processed URLs (one store read per run)."""
+    blob = await processed_urls_store.get_value(SEEN_BLOB_KEY)
+    return set(array('Q', blob)) if blob else set()
 
-    all_articles_from_feed = fetch_rss_feeds(
-        config.source,
-        custom_url=config.customFeedUrl,
-        max_articles=config.maxArticles
+async def save_processed_digests(seen: set, processed_urls_store: KeyValueStore) -> None:
+    """Writes `seen` back as one sorted, packed uint64 blob (8 bytes per URL)."""
+    await processed_urls_store.set_value(
+        SEEN_BLOB_KEY, array('Q', sorted(seen)).tobytes(), content_type="application/octet-stream"
+    )
+    Actor.log.info(f"Saved {len(seen)} processed URL digests.")
+
+async def flush_records(batch: List[Tuple[dict, int]], seen: set) -> None:
+    """Pushes the batched records in one call, then marks their URLs as processed."""
+    await Actor.push_data([record for record, _ in batch])
+    Actor.log.info(f"Pushed batch of {len(batch)} records to dataset.")
+    seen.update(digest for _, digest in batch)
+
+async def buffer_record(
+    record: dict,
+    digest: int,
+    pending: List[Tuple[dict, int]],
+    lock: asyncio.Lock,
+    seen: set
+) -> None:
+    """
+    Adds `record` to the shared `pending` buffer and flushes the buffer once it holds PUSH_BATCH_SIZE records.
+    The buffer is swapped out under `lock`; the flush itself runs outside it.
+    """
+    async with lock:
+        pending.append((record, digest))
+        if len(pending) < PUSH_BATCH_SIZE:
+            return
+        batch = pending[:]
+        pending.clear()
+
+    await flush_records(batch, seen)
+
+async def rss_fetcher(config: InputConfig, processed_urls_store: KeyValueStore) -> Tuple[List[Tuple[RSSFeed, int]], set]:
+    """
+    Returns the (article, URL digest) pairs to process plus the set of already-processed URL digests.
+    The digest travels with its article so it is not recomputed when the URL is marked as processed.
+    """
+    # The processed-URL blob is read concurrently with the feed download
+    all_articles_from_feed, seen = await asyncio.gather(
+        fetch_rss_feeds(
+            config.source,
+            custom_url=config.customFeedUrl,
+            max_articles=config.maxArticles
+        ),
+        load_processed_digests(processed_urls_store)
     )
 
     new_articles = []
     Actor.log.info(f"Fetched {len(all_articles_from_feed)} total articles. Checking for duplicates...")
 
-    for article in all_articles_from_feed:
-        url_key = hashlib.md5(str(article.link).encode('utf-8')).hexdigest()
-        is_duplicate = await processed_urls_store.get_value(url_key)
-        if not is_duplicate:
-            new_articles.append(article)
+    keyed_articles = [(article, _url_digest(article.link)) for article in all_articles_from_feed]
+    for article, digest in keyed_articles:
+        if digest not in seen:
+            new_articles.append((article, digest))
 
     if len(new_articles) < config.maxArticles:
         needed = config.maxArticles - len(new_articles)
         Actor.log.warning(
             f"Only {len(new_articles)} new articles found. Reusing {needed} previously processed ones to reach {config.maxArticles} total."
         )
-        remaining = [a for a in all_articles_from_feed if a not in new_articles][:needed]
+        # Membership by URL digest; comparing pydantic models field by field was O(N*M)
+        new_digests = {digest for _, digest in new_articles}
+        remaining = [pair for pair in keyed_articles if pair[1] not in new_digests][:needed]
         new_articles.extend(remaining)
 
     Actor.log.info(f"Processing {len(new_articles)} total articles (including recycled ones if needed).")
-    return {"articles": new_articles, "processed_count": 0}
-
-async def process_and_save_article(state: WorkflowState) -> dict:
-    articles = state["articles"]
-    config = state["config"]
-    processed_count = state["processed_count"]
-    processed_urls_store = state["processed_urls_store"]
+    return new_articles, seen
+
+async def process_and_save_article(
+    art: RSSFeed,
+    digest: int,
+    index: int,
+    total: int,
+    config: InputConfig,
+    pending: List[Tuple[dict, int]],
+    lock: asyncio.Lock,
+    seen: set
+) -> None:
+    Actor.log.info(f"Processing article {index} of {total}: {art.link}")
 
-    if processed_count >= len(articles):
-        Actor.log.info("No more articles to process.")
-        return {"processed_count": processed_count}
-
-    art = articles[processed_count]
-    Actor.log.info(f"Processing article {processed_count + 1} of {len(articles)}: {art.link}")
-
-    ai_overview = None
-    
     # --- PRIORITY 1: Strict Quoted Title Search ("Title") ---
     query_strict = f"\"{art.title}\""
-    Actor.log.info("Priority 1: Attempting strict DuckDuckGo search.")
-    
-    ai_overview = await fetch_summary_from_duckduckgo(
-        query=query_strict, 
-        is_test_mode=config.runTestMode,
-        region=config.region, 
-        time_limit=config.timeLimit
-    )
-    
     # --- PRIORITY 2: Less Restrictive Title Search (Title) ---
-    if not ai_overview:
-        query_loose = art.title.replace('"', '').strip() # Remove quotes if they were included
-        Actor.log.warning("Priority 1 failed. Attempting Priority 2: Loose DuckDuckGo search.")
-        
-        ai_overview = await fetch_summary_from_duckduckgo(
-            query=query_loose, 
-            is_test_mode=config.runTestMode,
-            region=config.region, 
-            time_limit=config.timeLimit
+    query_loose = art.title.replace('"', '').strip() # Remove quotes if they were included
+
+    if config.runTestMode:
+        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing DuckDuckGo Search and LLM calls.")
+        analysis_results = await summarize_and_analyze("", is_test_mode=True)
+    else:
+        # Only the two searches run concurrently, so a failed strict search does not cost another
+        # DDG round-trip; the chosen snippets then get a single LLM call
+        Actor.log.info("Priority 1 & 2: Starting strict and loose DuckDuckGo searches concurrently.")
+        snippets_strict, snippets_loose = await asyncio.gather(
+            fetch_snippets_from_duckduckgo(query_strict, region=config.region, time_limit=config.timeLimit),
+            fetch_snippets_from_duckduckgo(query_loose, region=config.region, time_limit=config.timeLimit),
+        )
+        snippets = snippets_strict
+        if not snippets:
+            Actor.log.warning("Priority 1 failed. Using Priority 2: Loose DuckDuckGo search.")
+            snippets = snippets_loose
+        analysis_results = (
+            await summarize_and_analyze(snippets, is_test_mode=False, model=config.analysisModel) if snippets else {}
         )
 
+    ai_overview = analysis_results.get("summary")
+
     # --- FALLBACK: Cleaned RSS Summary ---
     if not ai_overview and art.summary and len(art.summary.strip()) >= 50:
         Actor.log.warning("Priority 2 failed. Falling back to original RSS summary.")
-        # Strip HTML before using the RSS summary
+        # Strip HTML before using the RSS summary; the summary itself is kept as-is, only analyzed
         ai_overview = strip_html_tags(art.summary)
+        analysis_results = await summarize_and_analyze(ai_overview, config.runTestMode, config.analysisModel)
         
     if not ai_overview:
         # UPDATED LOGIC: Skip article on failure instead of exiting actor
-        Actor.log.error(f"❌ No AI summary could be generated for article {processed_count + 1}. Skipping to the next article.")
-        return {"processed_count": processed_count + 1}
+        Actor.log.error(f"❌ No AI summary could be generated for article {index}. Skipping to the next article.")
+        return
 
     art.summary = ai_overview
-    analysis_results = await analyze_article_summary(art.summary, config.runTestMode)
     
-    dataset_record = DatasetRecord(
+    # Every field was already checked upstream; skip re-validating (and re-parsing the URL) per article
+    dataset_record = DatasetRecord.model_construct(
         source=art.source,
         title=art.title,
         url=art.link,
@@ -118,59 +166,78 @@ async def process_and_save_article(state: WorkflowState) -> dict:
         sentiment=analysis_results.get("sentiment"),
         category=analysis_results.get("category"),
         key_entities=analysis_results.get("key_entities")
-    ).model_dump()
-
-    await Actor.push_data([dataset_record])
-    Actor.log.info(f"Pushed record for '{art.title[:50]}...' to dataset.")
-
-    url_key = hashlib.md5(str(art.link).encode('utf-8')).hexdigest()
-    await processed_urls_store.set_value(key=url_key, value=True)
-
-    return {"processed_count": processed_count + 1}
-
-def should_continue(state: WorkflowState) -> str:
-    articles = state["articles"]
-    processed_count = state["processed_count"]
-    return "continue" if processed_count < len(articles) else "end"
+    ).model_dump(warnings=False)  # url is the unvalidated link string, not an HttpUrl
+
+    Actor.log.info(f"Queued record for '{art.title[:50]}...'.")
+    # The URL is marked as processed only once its record has actually been pushed
+    await buffer_record(dataset_record, digest, pending, lock, seen)
+
+async def process_bounded(
+    art: RSSFeed,
+    digest: int,
+    index: int,
+    total: int,
+    config: InputConfig,
+    pending: List[Tuple[dict, int]],
+    lock: asyncio.Lock,
+    seen: set,
+    sem: asyncio.Semaphore
+) -> None:
+    """Runs `process_and_save_article` at most ARTICLE_CONCURRENCY at a time; a failed article is logged and skipped."""
+    async with sem:
+        try:
+            await process_and_save_article(art, digest, index, total, config, pending, lock, seen)
+        except Exception as e:
+            Actor.log.error(f"Failed to process article {art.link}: {e}")
 
 async def main():
     async with Actor:
-        input_data = await Actor.get_input()
-        config = InputConfig(**input_data)
-        Actor.log.info(f"Loaded config: {config}")
-
-        # UPDATED: Only check for OPENAI_API_KEY
-        if not config.runTestMode and not os.getenv("OPENAI_API_KEY"):
-            Actor.log.error("❌ Missing required API key in environment variables (OPENAI_API_KEY). Aborting execution.")
-            await Actor.exit(exit_code=1)
-            return
-
-        if config.runTestMode:
-            Actor.log.warning("!!! ADMIN TEST MODE ACTIVE: Actor is bypassing ALL EXTERNAL API costs. !!!")
-
-        processed_urls_store = await Actor.open_key_value_store(name="processed-urls-health")
-
-        graph = StateGraph(WorkflowState)
-        graph.add_node("RSSFetcher", rss_fetcher)
-        graph.add_node("ProcessAndSaveArticle", process_and_save_article)
-        graph.set_entry_point("RSSFetcher")
-
-        graph.add_conditional_edges("RSSFetcher", should_continue, {"continue": "ProcessAndSaveArticle", "end": "__end__"})
-        graph.add_conditional_edges("ProcessAndSaveArticle", should_continue, {"continue": "ProcessAndSaveArticle", "end": "__end__"})
-
-        app = graph.compile()
-        Actor.log.info("Starting Health & Fitness intelligence pipeline.")
-
-        recursion_config = {"recursion_limit": config.maxArticles + 5}
-
-        await app.ainvoke({
-            "config": config,
-            "articles": [],
-            "processed_count": 0,
-            "processed_urls_store": processed_urls_store
-        }, config=recursion_config)
-
-        Actor.log.info("🎯 Health & Fitness intelligence pipeline completed successfully!")
+        try:
+            input_data = await Actor.get_input()
+            config = InputConfig(**input_data)
+            Actor.log.info(f"Loaded config: {config}")
+
+            # UPDATED: Only check for OPENAI_API_KEY
+            if not config.runTestMode and not os.getenv("OPENAI_API_KEY"):
+                Actor.log.error("❌ Missing required API key in environment variables (OPENAI_API_KEY). Aborting execution.")
+                await Actor.exit(exit_code=1)
+                return
+
+            if config.runTestMode:
+                Actor.log.warning("!!! ADMIN TEST MODE ACTIVE: Actor is bypassing ALL EXTERNAL API costs. !!!")
+
+            processed_urls_store = await Actor.open_key_value_store(name="processed-urls-health")
+
+            Actor.log.info("Starting Health & Fitness intelligence pipeline.")
+            articles, seen = await rss_fetcher(config, processed_urls_store)
+
+            if not articles:
+                Actor.log.warning("No articles collected from any feed. Finishing pipeline.")
+                return
+
+            # Articles are independent, so they are processed concurrently instead of one step per loop iteration
+            Actor.log.info(f"Starting concurrent processing of {len(articles)} articles (concurrency={ARTICLE_CONCURRENCY}).")
+            sem = asyncio.Semaphore(ARTICLE_CONCURRENCY)
+            pending: List[Tuple[dict, int]] = []
+            lock = asyncio.Lock()
+            total = len(articles)
+            try:
+                await asyncio.gather(*(
+                    process_bounded(art, digest, index, total, config, pending, lock, seen, sem)
+                    for index, (art, digest) in enumerate(articles, start=1)
+                ))
+
+                # Flush the records left over from the last partial batch
+                if pending:
+                    await flush_records(pending, seen)
+            finally:
+                # One store write per run; URLs of records pushed before a failure are still saved
+                await save_processed_digests(seen, processed_urls_store)
+
+            Actor.log.info("🎯 Health & Fitness intelligence pipeline completed successfully!")
+
+        finally:
+            await close_http_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -25,6 +25,7 @@ class InputConfig(BaseModel):
     region: str = Field("wt-wt", description="Region for search results.")
     timeLimit: str = Field("w", description="Time limit for search results.")
     # ----------------------
+    analysisModel: str = Field("gpt-4o-mini", description="OpenAI model for the combined summary/analysis call.")
     runTestMode: bool = Field(False, description="Enables internal test mode to bypass Apify Actor calls.")
 
 class SummaryResult(BaseModel):
@@ -1,20 +1,24 @@
-import feedparser
+import httpx
 import re
 import os
-# Removed httpx
-import json
+import orjson
 import asyncio
+import functools
+import types
+from itertools import zip_longest
 from typing import List, Dict, Any, Tuple
 from apify import Actor
 from apify_client import ApifyClient
-from openai import OpenAI
+from openai import AsyncOpenAI
+from lxml import etree
+from selectolax.lexbor import LexborHTMLParser
 from .models import RSSFeed
-from langchain_community.tools import DuckDuckGoSearchResults
-from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
 
-def init_openai() -> OpenAI:
+@functools.lru_cache(maxsize=1)
+def init_openai() -> AsyncOpenAI:
     # The OpenAI client automatically looks for the OPENAI_API_KEY environment variable.
-    return OpenAI()
+    # One shared async client: its connection pool is reused and calls do not block the event loop.
+    return AsyncOpenAI()
 
 # New categories for Health & Fitness
 CATEGORIES = [
@@ -22,163 +26,280 @@ CATEGORIES = [
     "Medical News/Research", "Fitness Business/Tech", "Product/Gear", "General Health"
 ]
 
-def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20) -> List[RSSFeed]:
-    # New feed_map based on your provided URLs
-    feed_map = {
-        # General Fitness & Training
-        "mens-health": "https://www.menshealth.com/rss/all.xml/",
-        "myfitnesspal": "https://blog.myfitnesspal.com/feed",
-        "born-fitness": "https://www.bornfitness.com/feed/",
-        "trainerize": "http://feeds.feedburner.com/TrainerizeBlog",
-        "wod-guru": "https://wod.guru/feed/",
-        "breaking-muscle": "https://breakingmuscle.com/feed/",
-        "fitnessista": "https://fitnessista.com/feed/",
-        "anytime-fitness": "https://www.anytimefitness.co.in/feed/",
-        "nasm": "https://blog.nasm.org/rss.xml",
-        "girls-gone-strong": "https://www.girlsgonestrong.com/feed",
-        "popsugar-fitness": "https://www.popsugar.com/feed",
-        "the-fit-bits": "http://www.thefitbits.com/feed",
-
-        # Nutrition & Healthy Eating
-        "precision-nutrition": "https://www.precisionnutrition.com/feed",
-        "bites-of-wellness": "https://bitesofwellness.com/feed/",
-        "eating-bird-food": "https://www.eatingbirdfood.com/feed/",
-        "nutrition-stripped": "https://nutritionstripped.com/articles/feed/",
-        "oh-she-glows": "https://ohsheglows.com/feed/",
-        "nutritionfacts": "https://nutritionfacts.org/feed/",
-        "delish-knowledge": "https://www.delishknowledge.com/feed/",
-        "real-food-dietitians": "https://therealfooddietitians.com/feed",
-        "fit-foodie-finds": "https://fitfoodiefinds.com/feed/",
-        "toby-amidor-nutrition": "https://tobyamidornutrition.com/feed",
-        "pbfingers": "https://www.pbfingers.com/feed",
-        "the-healthy-maven": "https://www.thehealthymaven.com/feed",
-        "nutrition-twins": "https://www.nutritiontwins.com/feed",
-        "the-full-helping": "https://www.thefullhelping.com/feed",
-        "the-fit-foodie": "https://the-fit-foodie.com/feed",
-
-        # Holistic Wellness & Lifestyle
-        "fit-bottomed-girls": "https://fitbottomedgirls.com/category/fitness/fitness-blogs/feed/",
-        "art-of-healthy-living": "https://artofhealthyliving.com/feed/",
-        "shape": "https://feeds-api.dotdashmeredith.com/v1/rss/google/5814e1d4-bdb5-4afb-a458-61bfc1585860",
-        "health": "https://feeds-api.dotdashmeredith.com/v1/rss/google/3a6c43d9-d394-4797-9855-97f429e5b1ff",
-        "healthshots": "https://www.healthshots.com/rss-feeds/",
-        "mommypotamus": "https://mommypotamus.com/feed",
-        "natural-living-ideas": "https://www.naturallivingideas.com/feed",
-        "a-healthy-slice-of-life": "https://www.ahealthysliceoflife.com/feed",
-        "unlikely-martha": "https://unlikelymartha.com/feed",
-
-        # Fitness Business & Tech
-        "athletechnews": "https://athletechnews.com/feed",
-        "health-club-management": "https://www.healthclubmanagement.co.uk/feed/news-feed.xml",
-        "club-solutions": "https://clubsolutionsmagazine.com/feed/",
-        "total-health-and-fitness": "https://www.totalhealthandfitness.com/feed/",
-        "core-handf": "https://corehandf.com/blog/rss.xml",
-
-        "custom": custom_url
-    }
-    
+# --- RSS/Atom parsing (lxml) ---
+_ATOM = "{http://www.w3.org/2005/Atom}"
+# recover=True tolerates the malformed markup many blog feeds ship; no entity expansion or network access
+_XML_PARSER = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+FEED_TIMEOUT_SECONDS = 20.0
+FEED_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; HealthFitnessIntelligence/1.0)"}
+
+# --- DuckDuckGo (HTML endpoint, parsed with selectolax) ---
+DDG_HTML_URL = "https://html.duckduckgo.com/html/"
+DDG_TIMEOUT_SECONDS = 10.0
+DDG_MAX_RESULTS = 5
+
+# One pooled HTTP/2 client for the feed downloads and all DuckDuckGo searches,
+# so repeated requests to the same host reuse their TLS connection
+_HTTP = httpx.AsyncClient(
+    http2=True,
+    headers=FEED_HEADERS,
+    follow_redirects=True,
+    timeout=FEED_TIMEOUT_SECONDS,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+)
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client; call once when the actor finishes."""
+    await _HTTP.aclose()
+
+def _atom_link(entry) -> str:
+    for link in entry.iterfind(f"{_ATOM}link"):
+        if link.get("rel", "alternate") == "alternate" and link.get("href"):
+            return link.get("href")
+    return ""
+
+def _with_http_link(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # RSSFeed objects are built without validation, so entries that could never be a valid HttpUrl are dropped here
+    return [entry for entry in entries if entry["link"].startswith(("http://", "https://"))]
+
+def _parse_feed_xml(content: bytes) -> Tuple[str | None, List[Dict[str, Any]]]:
+    """
+    Parses an RSS 2.0 or Atom document into (feed title, entries).
+    Only the fields used downstream are extracted: title, link, published and summary.
+    Entries without an http(s) link are skipped.
+    """
+    root = etree.fromstring(content, parser=_XML_PARSER)
+    if root is None:
+        return None, []
+
+    entries = [
+        {
+            "title": (item.findtext("title") or "").strip(),
+            "link": (item.findtext("link") or "").strip(),
+            "published": item.findtext("pubDate"),
+            "summary": item.findtext("description"),
+        }
+        for item in root.iter("item")
+    ]
+    if entries:
+        return root.findtext("channel/title"), _with_http_link(entries)
+
+    entries = [
+        {
+            "title": (entry.findtext(f"{_ATOM}title") or "").strip(),
+            "link": _atom_link(entry),
+            "published": entry.findtext(f"{_ATOM}published") or entry.findtext(f"{_ATOM}updated"),
+            "summary": entry.findtext(f"{_ATOM}summary") or entry.findtext(f"{_ATOM}content"),
+        }
+        for entry in root.iter(f"{_ATOM}entry")
+    ]
+    return root.findtext(f"{_ATOM}title"), _with_http_link(entries)
+
+async def _fetch_feed(feed_url: str) -> Tuple[str | None, List[Dict[str, Any]]]:
+    response = await _HTTP.get(feed_url)
+    response.raise_for_status()
+    return _parse_feed_xml(response.content)
+
+# New feed_map based on your provided URLs
+# Built once at import and read-only; the "custom" source is handled from `custom_url` in fetch_rss_feeds
+_FEED_MAP = types.MappingProxyType({
+    # General Fitness & Training
+    "mens-health": "https://www.menshealth.com/rss/all.xml/",
+    "myfitnesspal": "https://blog.myfitnesspal.com/feed",
+    "born-fitness": "https://www.bornfitness.com/feed/",
+    "trainerize": "http://feeds.feedburner.com/TrainerizeBlog",
+    "wod-guru": "https://wod.guru/feed/",
+    "breaking-muscle": "https://breakingmuscle.com/feed/",
+    "fitnessista": "https://fitnessista.com/feed/",
+    "anytime-fitness": "https://www.anytimefitness.co.in/feed/",
+    "nasm": "https://blog.nasm.org/rss.xml",
+    "girls-gone-strong": "https://www.girlsgonestrong.com/feed",
+    "popsugar-fitness": "https://www.popsugar.com/feed",
+    "the-fit-bits": "http://www.thefitbits.com/feed",
+
+    # Nutrition & Healthy Eating
+    "precision-nutrition": "https://www.precisionnutrition.com/feed",
+    "bites-of-wellness": "https://bitesofwellness.com/feed/",
+    "eating-bird-food": "https://www.eatingbirdfood.com/feed/",
+    "nutrition-stripped": "https://nutritionstripped.com/articles/feed/",
+    "oh-she-glows": "https://ohsheglows.com/feed/",
+    "nutritionfacts": "https://nutritionfacts.org/feed/",
+    "delish-knowledge": "https://www.delishknowledge.com/feed/",
+    "real-food-dietitians": "https://therealfooddietitians.com/feed",
+    "fit-foodie-finds": "https://fitfoodiefinds.com/feed/",
+    "toby-amidor-nutrition": "https://tobyamidornutrition.com/feed",
+    "pbfingers": "https://www.pbfingers.com/feed",
+    "the-healthy-maven": "https://www.thehealthymaven.com/feed",
+    "nutrition-twins": "https://www.nutritiontwins.com/feed",
+    "the-full-helping": "https://www.thefullhelping.com/feed",
+    "the-fit-foodie": "https://the-fit-foodie.com/feed",
+
+    # Holistic Wellness & Lifestyle
+    "fit-bottomed-girls": "https://fitbottomedgirls.com/category/fitness/fitness-blogs/feed/",
+    "art-of-healthy-living": "https://artofhealthyliving.com/feed/",
+    "shape": "https://feeds-api.dotdashmeredith.com/v1/rss/google/5814e1d4-bdb5-4afb-a458-61bfc1585860",
+    "health": "https://feeds-api.dotdashmeredith.com/v1/rss/google/3a6c43d9-d394-4797-9855-97f429e5b1ff",
+    "healthshots": "https://www.healthshots.com/rss-feeds/",
+    "mommypotamus": "https://mommypotamus.com/feed",
+    "natural-living-ideas": "https://www.naturallivingideas.com/feed",
+    "a-healthy-slice-of-life": "https://www.ahealthysliceoflife.com/feed",
+    "unlikely-martha": "https://unlikelymartha.com/feed",
+
+    # Fitness Business & Tech
+    "athletechnews": "https://athletechnews.com/feed",
+    "health-club-management": "https://www.healthclubmanagement.co.uk/feed/news-feed.xml",
+    "club-solutions": "https://clubsolutionsmagazine.com/feed/",
+    "total-health-and-fitness": "https://www.totalhealthandfitness.com/feed/",
+    "core-handf": "https://corehandf.com/blog/rss.xml",
+})
+
+async def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 20) -> List[RSSFeed]:
     urls = []
-    if source == "custom" and custom_url: urls.append(custom_url)
-    elif source == "all": urls = [url for key, url in feed_map.items() if key != "custom" and url is not None]
+    if source == "custom":
+        if custom_url: urls.append(custom_url)
+    elif source == "all": urls = list(_FEED_MAP.values())
     else:
-        if selected := feed_map.get(source): urls.append(selected)
+        if selected := _FEED_MAP.get(source): urls.append(selected)
+
+    # All feeds are downloaded concurrently, so the wall time is the slowest feed
+    # rather than the sum of all of them; results keep the `urls` order
+    Actor.log.info(f"Parsing {len(urls)} feed(s) concurrently.")
+    parsed_list = await asyncio.gather(
+        *(_fetch_feed(feed_url) for feed_url in urls),
+        return_exceptions=True
+    )
 
     parsed_feeds = []
-    for feed_url in urls:
-        Actor.log.info(f"Parsing feed: {feed_url}")
+    for feed_url, parsed in zip(urls, parsed_list):
         try:
-            parsed = feedparser.parse(feed_url)
-            if parsed.entries:
-                source_title = parsed.feed.get("title", f"Unknown ({feed_url})")
-                parsed_feeds.append((iter(parsed.entries), source_title))
+            if isinstance(parsed, BaseException): raise parsed
+            feed_title, entries = parsed
+            if entries:
+                source_title = feed_title or f"Unknown ({feed_url})"
+                parsed_feeds.append((iter(entries), source_title))
             else: Actor.log.warning(f"Feed {feed_url} returned no entries.")
         except Exception as e: Actor.log.warning(f"Failed to parse feed {feed_url}: {e}")
 
     articles = []
     if len(parsed_feeds) > 1 and source == "all":
-        available_feeds = list(parsed_feeds)
-        while len(articles) < max_articles and available_feeds:
-            feeds_to_remove = []
-            for i, (entry_iterator, source_title) in enumerate(available_feeds):
+        # Round-robin: each round yields the next entry of every feed; exhausted feeds are padded with None
+        source_titles = [source_title for _, source_title in parsed_feeds]
+        for round_entries in zip_longest(*(entry_iterator for entry_iterator, _ in parsed_feeds)):
+            for entry, source_title in zip(round_entries, source_titles):
+                if entry is None: continue
+                articles.append(RSSFeed.model_construct(title=entry["title"], link=entry["link"], source=source_title, published=entry["published"], summary=entry["summary"]))
                 if len(articles) >= max_articles: break
-                try:
-                    entry = next(entry_iterator)
-                    articles.append(RSSFeed(title=entry.get("title", ""), link=entry.get("link", ""), source=source_title, published=entry.get("published"), summary=entry.get("summary")))
-                except StopIteration: feeds_to_remove.append(i)
-                except Exception as e:
-                    Actor.log.warning(f"Error reading entry from {source_title}, removing feed: {e}")
-                    feeds_to_remove.append(i)
-            for index in sorted(feeds_to_remove, reverse=True): available_feeds.pop(index)
+            if len(articles) >= max_articles: break
     elif len(parsed_feeds) == 1:
         entry_iterator, source_title = parsed_feeds[0]
         for i, entry in enumerate(entry_iterator):
             if i >= max_articles: break
-            articles.append(RSSFeed(title=entry.get("title", ""), link=entry.get("link", ""), source=source_title, published=entry.get("published"), summary=entry.get("summary")))
+            articles.append(RSSFeed.model_construct(title=entry["title"], link=entry["link"], source=source_title, published=entry["published"], summary=entry["summary"]))
         Actor.log.info(f"Collected {len(articles)} articles from single source: {source_title}.")
 
     Actor.log.info(f"Collected a total of {len(articles)} articles.")
     return articles
 
-async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
-    if is_test_mode: return "This is a test summary generated from dummy search snippets about a recent health or fitness trend."
+# Default chat model for the combined summary/analysis call (InputConfig.analysisModel overrides it)
+ANALYSIS_MODEL = "gpt-4o-mini"
+# One paragraph of summary plus the small analysis object fits well within this
+ANALYSIS_MAX_TOKENS = 400
+
+# Updated sentiment options for health context
+SENTIMENT_OPTIONS = ("High Importance (e.g., medical warning)", "Medium Importance (e.g., new study)", "General Info/Tip")
+CATEGORY_LIST_STR = ", ".join(CATEGORIES)
+ANALYSIS_SYSTEM_PROMPT = "You are a professional Health & Fitness news analyst. Return a JSON object with 'summary', 'sentiment', 'category', and 'key_entities'."
+# Static instructions come first and the per-article material last, so every request shares a
+# byte-identical prefix (eligible for OpenAI's automatic prompt caching)
+ANALYSIS_PROMPT_PREFIX = f'Based ONLY on the following raw source material about a Health & Fitness news event, provide a structured JSON output with:\n1. summary: A concise, neutral, one-paragraph summary of the main news event.\n2. sentiment: The news importance level ({", ".join(SENTIMENT_OPTIONS)}).\n3. category: The best category from this list: {CATEGORY_LIST_STR}.\n4. key_entities: A list of up to 3 key ingredients, exercises, health concepts, or brands.\n\nOutput a single valid JSON object.\n\nSource material:\n---\n'
+ANALYSIS_PROMPT_SUFFIX = "\n---"
+
+async def summarize_and_analyze(snippets: str, is_test_mode: bool, model: str = ANALYSIS_MODEL) -> Dict[str, Any]:
+    """
+    Summarizes the source material (search snippets or a cleaned RSS summary) and analyzes it in a single LLM call.
+    Returns a dict with 'summary', 'sentiment', 'category' and 'key_entities'; 'summary' is empty on failure.
+    """
+    if is_test_mode:
+        Actor.log.warning("ADMIN TEST MODE: Bypassing LLM summarization/analysis call.")
+        return {
+            "summary": "This is a test summary generated from dummy search snippets about a recent health or fitness trend.",
+            "sentiment": "General Info (TEST)", "category": "Nutrition/Recipes (TEST)", "key_entities": ["Vitamin D", "HIIT", "Wellness"]
+        }
+
+    if not snippets or len(snippets) < 20:
+        Actor.log.warning("Source material too short for analysis. Skipping LLM call.")
+        return {"summary": "", "sentiment": "N/A", "category": "N/A", "key_entities": []}
 
     client = init_openai()
-    prompt = f"Based on the following raw search result snippets, synthesize a concise, neutral, one-paragraph summary of the main news event.\n\nSnippets:\n---\n{snippets}\n---"
+    prompt = ANALYSIS_PROMPT_PREFIX + snippets + ANALYSIS_PROMPT_SUFFIX
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
+        response = await client.chat.completions.create(
+            model=model,
             messages=[
-                {"role": "system", "content": "You are a news summarization assistant. Generate a single coherent paragraph summarizing the provided search result snippets."},
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.2,
+            temperature=0.0,
+            max_tokens=ANALYSIS_MAX_TOKENS,
+            response_format={"type": "json_object"},
         )
-        summary = response.choices[0].message.content.strip()
-        Actor.log.info("Successfully generated summary from search snippets.")
-        return summary
+        output_text = response.choices[0].message.content.strip()
+        parsed = orjson.loads(output_text)
+        entities = parsed.get("key_entities", [])
+        if not isinstance(entities, list): entities = [str(entities)] if entities else []
+        sentiment = str(parsed.get("sentiment", "N/A")).strip()
+        if sentiment not in SENTIMENT_OPTIONS: sentiment = "General Info/Tip"
+        Actor.log.info("Successfully generated summary and analysis from source material.")
+        return {
+            "summary": str(parsed.get("summary") or "").strip(),
+            "sentiment": sentiment, "category": str(parsed.get("category", "N/A")).strip(), "key_entities": entities
+        }
     except Exception as e:
-        Actor.log.warning(f"LLM summarization failed: {e}")
-        return ""
+        Actor.log.warning(f"LLM summarization/analysis failed: {e}")
+        return {"summary": "", "sentiment": "Error", "category": "Error", "key_entities": []}
+
+def _parse_ddg_html(html: str) -> List[Dict[str, str]]:
+    """Extracts up to DDG_MAX_RESULTS organic {title, snippet} results from a DuckDuckGo HTML results page."""
+    results = []
+    for node in LexborHTMLParser(html).css("div.result"):
+        if "result--ad" in (node.attributes.get("class") or ""): continue
+        title_node = node.css_first("a.result__a")
+        snippet_node = node.css_first(".result__snippet")
+        results.append({
+            "title": ' '.join(title_node.text().split()) if title_node else "N/A",
+            "snippet": ' '.join(snippet_node.text().split()) if snippet_node else "",
+        })
+        if len(results) >= DDG_MAX_RESULTS: break
+    return results
+
+async def _search_duckduckgo(query: str, region: str | None, time_limit: str | None) -> List[Dict[str, str]]:
+    params = {"q": query}
+    if region: params["kl"] = region
+    if time_limit: params["df"] = time_limit
+    response = await _HTTP.get(DDG_HTML_URL, params=params, timeout=DDG_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return _parse_ddg_html(response.text)
 
-async def fetch_summary_from_duckduckgo(query: str, is_test_mode: bool, region: str | None = None, time_limit: str | None = None) -> str:
+async def fetch_snippets_from_duckduckgo(query: str, region: str | None = None, time_limit: str | None = None) -> str:
     """
-    Fetches snippets from DuckDuckGo and returns an LLM-generated summary.
-    Replaces the old Google search function.
+    Fetches snippets from DuckDuckGo and returns them formatted for the LLM prompt,
+    or an empty string when no usable snippets were found. No LLM call is made here.
     """
-    if is_test_mode:
-        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing DuckDuckGo Search and LLM calls.")
-        return await summarize_snippets_with_llm("", is_test_mode=True)
-
     # Prepare parameters for DDG
     time_param_for_api = None if time_limit and time_limit.lower() == 'any' else time_limit
     region_param_for_api = region 
 
-    Actor.log.info(f"Searching DuckDuckGo News (Region: {region_param_for_api or 'any'}, Time: {time_param_for_api or 'any'}) for: {query[:60]}...")
+    Actor.log.info(f"Searching DuckDuckGo (Region: {region_param_for_api or 'any'}, Time: {time_param_for_api or 'any'}) for: {query[:60]}...")
     
     try:
-        def run_langchain_search():
-            wrapper = DuckDuckGoSearchAPIWrapper(
-                region=region_param_for_api, 
-                time=time_param_for_api, 
-                max_results=5, 
-                backend="news" # Focus search on news results
-            )
-            # Use DuckDuckGoSearchResults tool for structured output
-            search_tool = DuckDuckGoSearchResults(
-                api_wrapper=wrapper, 
-                output_format="list",
-                backend="news" 
-            )
-            return search_tool.invoke(query)
-
-        search_results = await asyncio.to_thread(run_langchain_search)
-
+        search_results = await _search_duckduckgo(query, region_param_for_api, time_param_for_api)
     except Exception as e:
-        Actor.log.error(f"An unexpected error occurred during DuckDuckGo (LangChain) search ({type(e).__name__}): {e}")
+        Actor.log.error(f"An unexpected error occurred during DuckDuckGo search ({type(e).__name__}): {e}")
         return ""
 
     if not search_results:
-        Actor.log.warning("DuckDuckGo (LangChain) search returned no items.")
+        Actor.log.warning("DuckDuckGo search returned no items.")
         return ""
 
     # --- Build LLM prompt from snippets ---
@@ -193,45 +314,21 @@ async def fetch_summary_from_duckduckgo(query: str, is_test_mode: bool, region:
 
     # Log the count of *usable* snippets
     usable_snippet_count = len([item for item in search_results if item.get('snippet')])
-    Actor.log.info(f"Collected {usable_snippet_count} usable snippets from DuckDuckGo News.")
-
-    return await summarize_snippets_with_llm(snippets_for_prompt, is_test_mode=False)
+    Actor.log.info(f"Collected {usable_snippet_count} usable snippets from DuckDuckGo.")
 
+    return snippets_for_prompt
 
-async def analyze_article_summary(summary: str, is_test_mode: bool) -> Dict[str, Any]:
+async def fetch_analysis_from_duckduckgo(query: str, is_test_mode: bool, region: str | None = None, time_limit: str | None = None, model: str = ANALYSIS_MODEL) -> Dict[str, Any]:
+    """
+    Fetches snippets from DuckDuckGo and returns the LLM-generated summary and analysis
+    (see `summarize_and_analyze`), or an empty dict when no usable snippets were found.
+    Replaces the old Google search function.
+    """
     if is_test_mode:
-        Actor.log.warning("ADMIN TEST MODE: Bypassing LLM analysis call.")
-        return {"sentiment": "General Info (TEST)", "category": "Nutrition/Recipes (TEST)", "key_entities": ["Vitamin D", "HIIT", "Wellness"]}
-
-    client = init_openai()
-    if not summary or len(summary) < 20:
-        Actor.log.warning("Summary too short for analysis. Skipping LLM call.")
-        return {"sentiment": "N/A", "category": "N/A", "key_entities": []}
-
-    # Updated sentiment options for health context
-    sentiment_options = ["High Importance (e.g., medical warning)", "Medium Importance (e.g., new study)", "General Info/Tip"]
-    category_list_str = ", ".join(CATEGORIES)
-    # Updated prompt
-    prompt = f'Analyze the following Health & Fitness news summary: "{summary}"\n\nBased ONLY on the summary, provide a structured JSON output with:\n1. sentiment: The news importance level ({", ".join(sentiment_options)}).\n2. category: The best category from this list: {category_list_str}.\n3. key_entities: A list of up to 3 key ingredients, exercises, health concepts, or brands.\n\nOutput a single valid JSON object.'
+        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing DuckDuckGo Search and LLM calls.")
+        return await summarize_and_analyze("", is_test_mode=True)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                # Updated system prompt
-                {"role": "system", "content": "You are a professional Health & Fitness analyst. Return a JSON object with 'sentiment', 'category', and 'key_entities'."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            response_format={"type": "json_object"},
-        )
-        output_text = response.choices[0].message.content.strip()
-        parsed = json.loads(output_text)
-        entities = parsed.get("key_entities", [])
-        if not isinstance(entities, list): entities = [str(entities)] if entities else []
-        sentiment = str(parsed.get("sentiment", "N/A")).strip()
-        if sentiment not in sentiment_options: sentiment = "General Info/Tip"
-        return {"sentiment": sentiment, "category": str(parsed.get("category", "N/A")).strip(), "key_entities": entities}
-    except Exception as e:
-        Actor.log.warning(f"LLM analysis failed: {e}")
-        return {"sentiment": "Error", "category": "Error", "key_entities": []}
\ No newline at end of file
+    snippets_for_prompt = await fetch_snippets_from_duckduckgo(query, region, time_limit)
+    if not snippets_for_prompt:
+        return {}
+    return await summarize_and_analyze(snippets_for_prompt, is_test_mode=False, model=model)
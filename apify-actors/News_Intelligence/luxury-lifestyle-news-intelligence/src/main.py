@@ -6,7 +6,7 @@ import asyncio
 import hashlib
 import re # Added for HTML stripping helper function
 from .models import RSSFeed, Article, InputConfig, DatasetRecord, SnippetSource
-from .tools import fetch_rss_feeds, fetch_summary_from_duckduckgo, analyze_article_summary
+from .tools import fetch_rss_feeds, fetch_snippets_from_duckduckgo, summarize_snippets_batch, analyze_article_summaries, close_http_session
 from apify.storages import KeyValueStore
 
 # --- HELPER FUNCTION FOR CLEANING (REQUIRED FOR FALLBACK) ---
@@ -26,6 +26,11 @@ def strip_html_tags(text):
 class WorkflowState(TypedDict):
     config: InputConfig
     articles: List[Article]
+    # Per-article results of the search/summarize stages, aligned with `articles`
+    snippet_groups: List[str]
+    snippet_sources: List[List[dict]]
+    summaries: List[str]
+    analyses: List[dict]
     processed_count: int
     processed_urls_store: KeyValueStore
 
@@ -33,7 +38,7 @@ async def rss_fetcher(state: WorkflowState) -> dict:
     config = state["config"]
     processed_urls_store = state["processed_urls_store"]
 
-    all_articles_from_feed = fetch_rss_feeds(
+    all_articles_from_feed = await fetch_rss_feeds(
         config.source,
         custom_url=config.customFeedUrl,
         max_articles=config.maxArticles
@@ -58,10 +63,65 @@ async def rss_fetcher(state: WorkflowState) -> dict:
 
     Actor.log.info(f"Processing {len(new_articles)} total articles (including recycled ones if needed).")
     return {"articles": new_articles, "processed_count": 0}
+
+async def search_snippets(state: WorkflowState) -> dict:
+    """Collects the DuckDuckGo snippets of every article first, so they can be summarized in batches."""
+    articles = state["articles"]
+    config = state["config"]
+
+    snippet_groups = []
+    snippet_sources = []
+    for i, art in enumerate(articles, start=1):
+        Actor.log.info(f"Searching snippets for article {i} of {len(articles)}: {art.link}")
+
+        # --- PRIORITY 1: Strict Quoted Title Search ("Title") ---
+        query_strict = f"\"{art.title}\""
+        Actor.log.info("Priority 1: Attempting strict DuckDuckGo search.")
+        snippets, sources = await fetch_snippets_from_duckduckgo(
+            query=query_strict, 
+            is_test_mode=config.runTestMode,
+            region=config.region, 
+            time_limit=config.timeLimit
+        )
+
+        # --- PRIORITY 2: Less Restrictive Title Search (Title) ---
+        if not snippets:
+            query_loose = art.title.replace('"', '').strip() # Remove quotes for loose search
+            Actor.log.warning("Priority 1 failed. Attempting Priority 2: Loose DuckDuckGo search.")
+            snippets, sources = await fetch_snippets_from_duckduckgo(
+                query=query_loose, 
+                is_test_mode=config.runTestMode,
+                region=config.region, 
+                time_limit=config.timeLimit
+            )
+
+        snippet_groups.append(snippets)
+        snippet_sources.append(sources)
+
+    return {"snippet_groups": snippet_groups, "snippet_sources": snippet_sources}
+
+async def summarize_snippets(state: WorkflowState) -> dict:
+    """Summarizes all collected snippet groups, several articles per LLM call."""
+    summaries = await summarize_snippets_batch(state["snippet_groups"], state["config"].runTestMode)
+    snippet_sources = list(state["snippet_sources"])
+
+    for i, art in enumerate(state["articles"]):
+        # --- FALLBACK (LAST RESORT): Cleaned RSS Summary ---
+        if not summaries[i] and art.summary and len(art.summary.strip()) >= 50:
+            Actor.log.warning(f"No snippet summary available for article {i + 1}. Falling back to original RSS summary.")
+            # Strip HTML before using the RSS summary
+            summaries[i] = strip_html_tags(art.summary)
+            snippet_sources[i] = None # Clear snippet sources since we didn't use DDG results
+
+    return {"summaries": summaries, "snippet_sources": snippet_sources}
+
+async def analyze_summaries(state: WorkflowState) -> dict:
+    """Analyzes all final summaries, several articles per LLM call."""
+    analyses = await analyze_article_summaries(state["summaries"], state["config"].runTestMode)
+    return {"analyses": analyses}
     
 async def process_and_save_article(state: WorkflowState) -> dict:
     articles = state["articles"]
-    config = state["config"]
     processed_count = state["processed_count"]
     processed_urls_store = state["processed_urls_store"]
 
@@ -72,46 +132,17 @@ async def process_and_save_article(state: WorkflowState) -> dict:
     art = articles[processed_count]
     Actor.log.info(f"Processing article {processed_count + 1} of {len(articles)}: {art.link}")
 
-    ai_overview = None
-    snippet_sources = [] # Initialize snippet_sources here
-    
-    # --- PRIORITY 1: Strict Quoted Title Search ("Title") ---
-    query_strict = f"\"{art.title}\""
-    Actor.log.info("Priority 1: Attempting strict DuckDuckGo search.")
-    
-    ai_overview, snippet_sources = await fetch_summary_from_duckduckgo(
-        query=query_strict, 
-        is_test_mode=config.runTestMode,
-        region=config.region, 
-        time_limit=config.timeLimit
-    )
-    
-    # --- PRIORITY 2: Less Restrictive Title Search (Title) ---
-    if not ai_overview:
-        query_loose = art.title.replace('"', '').strip() # Remove quotes for loose search
-        Actor.log.warning("Priority 1 failed. Attempting Priority 2: Loose DuckDuckGo search.")
-        
-        ai_overview, snippet_sources = await fetch_summary_from_duckduckgo(
-            query=query_loose, 
-            is_test_mode=config.runTestMode,
-            region=config.region, 
-            time_limit=config.timeLimit
-        )
+    # Results of the batched summarization (incl. RSS fallback) and analysis stages
+    ai_overview = state["summaries"][processed_count]
+    snippet_sources = state["snippet_sources"][processed_count]
+    analysis_results = state["analyses"][processed_count]
 
-    # --- FALLBACK (LAST RESORT): Cleaned RSS Summary ---
-    if not ai_overview and art.summary and len(art.summary.strip()) >= 50:
-        Actor.log.warning("Priority 2 failed. Falling back to original RSS summary.")
-        # Strip HTML before using the RSS summary
-        ai_overview = strip_html_tags(art.summary)
-        snippet_sources = None # Clear snippet sources since we didn't use DDG results
-        
     if not ai_overview:
         Actor.log.error(f"❌ No summary could be generated for article {processed_count + 1}. Skipping this article.")
         return {"processed_count": processed_count + 1}
 
     # Proceed with saving the best available summary (ai_overview)
     art.summary = ai_overview
-    analysis_results = await analyze_article_summary(art.summary, config.runTestMode)
     
     dataset_record = DatasetRecord(
         source=art.source,
@@ -158,24 +189,37 @@ async def main():
 
         graph = StateGraph(WorkflowState)
         graph.add_node("RSSFetcher", rss_fetcher)
+        graph.add_node("SearchSnippets", search_snippets)
+        graph.add_node("SummarizeSnippets", summarize_snippets)
+        graph.add_node("AnalyzeSummaries", analyze_summaries)
         graph.add_node("ProcessAndSaveArticle", process_and_save_article)
         graph.set_entry_point("RSSFetcher")
 
-        graph.add_conditional_edges("RSSFetcher", should_continue, {"continue": "ProcessAndSaveArticle", "end": "__end__"})
+        graph.add_conditional_edges("RSSFetcher", should_continue, {"continue": "SearchSnippets", "end": "__end__"})
+        graph.add_edge("SearchSnippets", "SummarizeSnippets")
+        graph.add_edge("SummarizeSnippets", "AnalyzeSummaries")
+        graph.add_edge("AnalyzeSummaries", "ProcessAndSaveArticle")
         graph.add_conditional_edges("ProcessAndSaveArticle", should_continue, {"continue": "ProcessAndSaveArticle", "end": "__end__"})
 
         app = graph.compile()
         # --- AMENDED LOG MESSAGE ---
         Actor.log.info("Starting Luxury & Lifestyle News Intelligence pipeline.")
 
-        recursion_config = {"recursion_limit": config.maxArticles + 5}
-
-        await app.ainvoke({
-            "config": config,
-            "articles": [],
-            "processed_count": 0,
-            "processed_urls_store": processed_urls_store
-        }, config=recursion_config)
+        recursion_config = {"recursion_limit": config.maxArticles + 8}
+
+        try:
+            await app.ainvoke({
+                "config": config,
+                "articles": [],
+                "snippet_groups": [],
+                "snippet_sources": [],
+                "summaries": [],
+                "analyses": [],
+                "processed_count": 0,
+                "processed_urls_store": processed_urls_store
+            }, config=recursion_config)
+        finally:
+            await close_http_session()
 
         # --- AMENDED LOG MESSAGE ---
         Actor.log.info("🎯 Luxury & Lifestyle News Intelligence pipeline completed successfully!")
@@ -1,19 +1,26 @@
-import feedparser
+# Rust-backed, feedparser-compatible API (parse() of the downloaded bytes, .entries, .feed)
+import feedparser_rs as feedparser
 import re
 import os
 import json
 import asyncio
+import hashlib
+import functools
+from collections import deque
+import aiohttp
 from typing import List, Dict, Any, Tuple
 from apify import Actor
 from apify_client import ApifyClient
-from openai import OpenAI
+from openai import AsyncOpenAI
 from .models import RSSFeed
 from langchain_community.tools import DuckDuckGoSearchResults
 from langchain_community.utilities import DuckDuckGoSearchAPIWrapper 
 
-def init_openai() -> OpenAI:
+@functools.lru_cache(maxsize=1)
+def init_openai() -> AsyncOpenAI:
     # This function relies on the OPENAI_API_KEY environment variable being set.
-    return OpenAI()
+    # One shared async client: its connection pool is reused and calls do not block the event loop.
+    return AsyncOpenAI()
 
 # --- AMENDED CATEGORIES FOR LUXURY & LIFESTYLE ---
 CATEGORIES = [
@@ -22,43 +29,84 @@ CATEGORIES = [
     "Wealth Management/High Net Worth (HNW) Trends", "Digital Luxury/Web3/Metaverse"
 ]
 
-def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10) -> List[RSSFeed]:
+# Chat model for the snippet summaries and the analyses
+LLM_MODEL = "gpt-4o-mini"
+
+# Maximum number of feeds downloaded/parsed at the same time
+RSS_FETCH_CONCURRENCY = 8
+
+# Per-feed HTTP validators (ETag/Last-Modified) and the entries of the last full download, kept across runs
+FEED_CACHE_STORE_NAME = "rss-http-cache"
+
+def _feed_cache_key(feed_url: str) -> str:
+    """SHA-256 of the feed URL; store keys may not contain the URL's characters."""
+    return hashlib.sha256(feed_url.encode('utf-8')).hexdigest()
+
+FEED_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; LuxuryLifestyleIntelligence/1.0; +https://apify.com)",
+    "Accept-Encoding": "gzip, deflate",
+}
+FEED_TIMEOUT_SECONDS = 30
+
+# One pooled session for all feed downloads, so repeat hosts reuse their TCP/TLS connections
+_session: aiohttp.ClientSession | None = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """Returns the shared session, creating it on first use (it must be created inside the running loop)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+            headers=FEED_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=FEED_TIMEOUT_SECONDS),
+        )
+    return _session
+
+async def close_http_session() -> None:
+    """Closes the shared session; call once when the actor finishes."""
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+# Luxury Daily's root feed aggregates all of its categories; the category feeds are only
+# read when the root feed alone cannot fill max_articles
+LUXURY_DAILY_ROOT_FEED = "https://www.luxurydaily.com/feed/"
+LUXURY_DAILY_CATEGORY_FEEDS = [
+    "https://www.luxurydaily.com/category/resources/news-briefs/feed/",
+    "https://www.luxurydaily.com/category/news/research/feed/",
+    "https://www.luxurydaily.com/category/news/events/feed/",
+    "https://www.luxurydaily.com/category/news/commerce-news/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/food-and-beverage/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/fragrance-and-personal-care/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/apparel-and-accessories/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/financial-services/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/education/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/consumer-packaged-goods/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/consumer-electronics/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/automotive-industry-sectors/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/arts-and-entertainment/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/government/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/healthcare/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/home-furnishings/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/jewelry/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/legal-and-privacy/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/marketing-industry-sectors/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/mediapublishing/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/nonprofits/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/real-estate/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/retail-industry-sectors/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/software-and-technology-industry-sectors/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/sports/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/telecommunications/feed/rss/",
+    "https://www.luxurydaily.com/category/sectors/travel-and-hospitality/feed/rss/",
+    "https://www.luxurydaily.com/category/opinion/blog/feed/rss/",
+    "https://www.luxurydaily.com/category/opinion/classic-guides/feed/rss/",
+    "https://www.luxurydaily.com/category/opinion/columns/feed/rss/",
+    "https://www.luxurydaily.com/category/opinion/editorials/feed/rss/",
+    "https://www.luxurydaily.com/category/opinion/letters/feed/rss/",
+]
+
+async def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10) -> List[RSSFeed]:
     # --- AMENDED FEED MAP FOR LUXURY & LIFESTYLE ---
-    luxury_daily_feeds = [
-        "https://www.luxurydaily.com/category/resources/news-briefs/feed/",
-        "https://www.luxurydaily.com/category/news/research/feed/",
-        "https://www.luxurydaily.com/category/news/events/feed/",
-        "https://www.luxurydaily.com/category/news/commerce-news/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/food-and-beverage/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/fragrance-and-personal-care/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/apparel-and-accessories/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/financial-services/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/education/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/consumer-packaged-goods/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/consumer-electronics/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/automotive-industry-sectors/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/arts-and-entertainment/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/government/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/healthcare/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/home-furnishings/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/jewelry/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/legal-and-privacy/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/marketing-industry-sectors/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/mediapublishing/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/nonprofits/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/real-estate/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/retail-industry-sectors/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/software-and-technology-industry-sectors/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/sports/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/telecommunications/feed/rss/",
-        "https://www.luxurydaily.com/category/sectors/travel-and-hospitality/feed/rss/",
-        "https://www.luxurydaily.com/category/opinion/blog/feed/rss/",
-        "https://www.luxurydaily.com/category/opinion/classic-guides/feed/rss/",
-        "https://www.luxurydaily.com/category/opinion/columns/feed/rss/",
-        "https://www.luxurydaily.com/category/opinion/editorials/feed/rss/",
-        "https://www.luxurydaily.com/category/opinion/letters/feed/rss/",
-    ]
-    
     feed_map = {
         "trulyclassy": "https://www.trulyclassy.com/feed/",
         "luxurylaunches": "https://luxurylaunches.com/web-stories/feed/",
@@ -75,7 +123,7 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10)
         "serrarigroup": "https://serrarigroup.com/feed/",
         "tempusmagazine": "https://tempusmagazine.co.uk/feed",
         "wmwnewsglobal": "https://www.wmwnewsglobal.com/feed/",
-        "luxurydaily": luxury_daily_feeds, # Concatenated feed
+        "luxurydaily": LUXURY_DAILY_ROOT_FEED,
         "custom": custom_url
     }
     # -----------------------------------------------
@@ -97,35 +145,95 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10)
             else:
                 urls.append(selected)
 
-    parsed_feeds = []
-    for feed_url in urls:
-        Actor.log.info(f"Parsing feed: {feed_url}")
-        try:
-            parsed = feedparser.parse(feed_url)
-            if parsed.entries:
-                source_title = parsed.feed.get("title", f"Unknown ({feed_url})")
-                # Special handling to consolidate source title for Luxury Daily feeds
-                if "luxurydaily.com" in feed_url:
-                    source_title = "Luxury Daily"
-                parsed_feeds.append((iter(parsed.entries), source_title))
-            else: Actor.log.warning(f"Feed {feed_url} returned no entries.")
-        except Exception as e: Actor.log.warning(f"Failed to parse feed {feed_url}: {e}")
+    # Feeds are downloaded on the shared session and parsed from bytes in a worker thread;
+    # at most RSS_FETCH_CONCURRENCY run at once and the results keep the `urls` order
+    sem = asyncio.Semaphore(RSS_FETCH_CONCURRENCY)
+    cache_store = await Actor.open_key_value_store(name=FEED_CACHE_STORE_NAME)
+
+    async def _parse_one(feed_url: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """Conditional GET against the cached validators; a 304 reuses the cached entries without downloading or parsing."""
+        async with sem:
+            cache_key = _feed_cache_key(feed_url)
+            meta = await cache_store.get_value(cache_key) or {}
+            headers = {}
+            if meta.get("entries"):
+                if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+                if meta.get("modified"): headers["If-Modified-Since"] = meta["modified"]
+            Actor.log.info(f"Parsing feed: {feed_url}")
+            async with _get_session().get(feed_url, headers=headers) as response:
+                if response.status == 304 and meta.get("entries"):
+                    Actor.log.info(f"Feed not modified, using cached entries: {feed_url}")
+                    return meta["title"], meta["entries"]
+                response.raise_for_status()
+                body = await response.read()
+                etag, modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            parsed = await asyncio.to_thread(feedparser.parse, body)
+
+            feed_title = parsed.feed.get("title", f"Unknown ({feed_url})")
+            entries = [
+                {"title": entry.get("title", ""), "link": entry.get("link", ""),
+                 "published": entry.get("published"), "summary": entry.get("summary")}
+                for entry in parsed.entries
+            ]
+            if entries:
+                await cache_store.set_value(cache_key, {
+                    "etag": etag, "modified": modified,
+                    "title": feed_title, "entries": entries
+                })
+            return feed_title, entries
+
+    async def _parse_all(feed_urls: List[str]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Parses `feed_urls` concurrently; returns (source title, entries) for every feed that yielded entries."""
+        results = await asyncio.gather(*[_parse_one(u) for u in feed_urls], return_exceptions=True)
+        feeds = []
+        for feed_url, parsed in zip(feed_urls, results):
+            try:
+                if isinstance(parsed, BaseException): raise parsed
+                feed_title, entries = parsed
+                if entries:
+                    source_title = feed_title
+                    # Special handling to consolidate source title for Luxury Daily feeds
+                    if "luxurydaily.com" in feed_url:
+                        source_title = "Luxury Daily"
+                    feeds.append((source_title, entries))
+                else: Actor.log.warning(f"Feed {feed_url} returned no entries.")
+            except Exception as e: Actor.log.warning(f"Failed to parse feed {feed_url}: {e}")
+        return feeds
+
+    feeds = await _parse_all(urls)
+
+    if LUXURY_DAILY_ROOT_FEED in urls and sum(len(entries) for _, entries in feeds) < max_articles:
+        Actor.log.info("Not enough entries for max_articles; adding the Luxury Daily category feeds.")
+        category_entries = [entry for _, entries in await _parse_all(LUXURY_DAILY_CATEGORY_FEEDS) for entry in entries]
+        luxury = next((entries for title, entries in feeds if title == "Luxury Daily"), None)
+        if luxury is not None: luxury.extend(category_entries)
+        elif category_entries: feeds.append(("Luxury Daily", category_entries))
+
+    # Feeds overlap (the root and category feeds, syndicated stories), so each link is used once
+    seen_links = set()
+    def _unseen(entries: List[Dict[str, Any]]):
+        for entry in entries:
+            link = entry.get("link", "")
+            if link in seen_links: continue
+            seen_links.add(link)
+            yield entry
+
+    parsed_feeds = [(_unseen(entries), source_title) for source_title, entries in feeds]
 
     articles = []
     if len(parsed_feeds) > 1 and source == "all":
-        available_feeds = list(parsed_feeds)
+        # Round-robin: take one entry from the front feed and rotate it to the back; exhausted feeds are dropped
+        available_feeds = deque(parsed_feeds)
         while len(articles) < max_articles and available_feeds:
-            feeds_to_remove = []
-            for i, (entry_iterator, source_title) in enumerate(available_feeds):
-                if len(articles) >= max_articles: break
-                try:
-                    entry = next(entry_iterator)
-                    articles.append(RSSFeed(title=entry.get("title", ""), link=entry.get("link", ""), source=source_title, published=entry.get("published"), summary=entry.get("summary")))
-                except StopIteration: feeds_to_remove.append(i)
-                except Exception as e:
-                    Actor.log.warning(f"Error reading entry from {source_title}, removing feed: {e}")
-                    feeds_to_remove.append(i)
-            for index in sorted(feeds_to_remove, reverse=True): available_feeds.pop(index)
+            entry_iterator, source_title = available_feeds.popleft()
+            try:
+                entry = next(entry_iterator)
+                articles.append(RSSFeed(title=entry.get("title", ""), link=entry.get("link", ""), source=source_title, published=entry.get("published"), summary=entry.get("summary")))
+            except StopIteration: continue
+            except Exception as e:
+                Actor.log.warning(f"Error reading entry from {source_title}, removing feed: {e}")
+                continue
+            available_feeds.append((entry_iterator, source_title))
     elif len(parsed_feeds) == 1:
         entry_iterator, source_title = parsed_feeds[0]
         for i, entry in enumerate(entry_iterator):
@@ -137,43 +245,73 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10)
     return articles
 
 
-async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
-    if is_test_mode: return "This is a test summary generated from dummy search snippets. It notes that Source A reported a surge in single-family home prices in Miami while Source B focused on the resulting lack of affordability for first-time buyers, showcasing a variation in reporting."
+# Number of snippet groups summarized per chat completion; the system prompt and instructions are paid once per batch
+SUMMARY_BATCH_SIZE = 8
+TEST_SUMMARY = "This is a test summary generated from dummy search snippets. It notes that Source A reported a surge in single-family home prices in Miami while Source B focused on the resulting lack of affordability for first-time buyers, showcasing a variation in reporting."
+
+
+async def summarize_snippets_batch(groups: List[str], is_test_mode: bool) -> List[str]:
+    """
+    Summarizes each snippet group (one per article) with one chat completion per SUMMARY_BATCH_SIZE groups.
+    Returns one summary per group, in order; empty groups and failed batches yield "".
+    """
+    summaries = [""] * len(groups)
+    pending = [i for i, snippets in enumerate(groups) if snippets]
+    if is_test_mode:
+        for i in pending: summaries[i] = TEST_SUMMARY
+        return summaries
 
     client = init_openai()
-    # --- AMENDED PROMPT FOR LUXURY & LIFESTYLE ---
-    prompt = f"Synthesize a concise, neutral, one-paragraph summary of the main Luxury, High-End Market, or Lifestyle news event from the following search results. Note the different sources and dates, and **briefly mention any significant variations in their reporting (e.g., conflicting facts, different focus, or opposing perspectives)**.\n\nSnippets:\n---\n{snippets}\n---"
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": "You are a Luxury and Lifestyle news summarization assistant. Your goal is to synthesize a single, coherent paragraph from multiple sourced snippets. Base your summary *only* on the snippets. If you detect notable differences in reporting between sources, briefly mention it."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
+
+    async def _summarize(batch: List[int]) -> None:
+        # --- AMENDED PROMPT FOR LUXURY & LIFESTYLE ---
+        prompt = (
+            f"Summarize each of the following {len(batch)} snippet groups. Each group is about a separate Luxury, High-End Market, or Lifestyle news event. "
+            "For each group, synthesize a concise, neutral, one-paragraph summary of the main news event. Note the different sources and dates, and **briefly mention any significant variations in their reporting (e.g., conflicting facts, different focus, or opposing perspectives)**.\n\n"
+            'Output a single JSON object: {"summaries": [{"group": <group number>, "summary": "<summary>"}, ...]} with one item per group.\n\n'
+            + "\n\n".join(f"Group {n}:\n---\n{groups[i]}\n---" for n, i in enumerate(batch, start=1))
         )
-        summary = response.choices[0].message.content.strip()
-        Actor.log.info("Successfully generated summary from search snippets.")
-        return summary
-    except Exception as e:
-        Actor.log.warning(f"LLM summarization failed: {e}")
-        return ""
+        try:
+            response = await client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a Luxury and Lifestyle news summarization assistant. Your goal is to synthesize a single, coherent paragraph per group from its sourced snippets. Base each summary *only* on that group's snippets and never mix groups. If you detect notable differences in reporting between sources, briefly mention it."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2,
+                response_format={"type": "json_object"},
+            )
+            parsed = json.loads(response.choices[0].message.content)
+            items = parsed.get("summaries", [])
+            for item in items if isinstance(items, list) else []:
+                if not isinstance(item, dict): continue
+                try: n = int(item.get("group"))
+                except (TypeError, ValueError): continue
+                if 1 <= n <= len(batch):
+                    summaries[batch[n - 1]] = str(item.get("summary") or "").strip()
+            Actor.log.info(f"Successfully generated {sum(1 for i in batch if summaries[i])}/{len(batch)} summaries from search snippets.")
+        except Exception as e:
+            Actor.log.warning(f"LLM batch summarization failed: {e}")
+
+    # Batches are independent, so their requests run concurrently
+    await asyncio.gather(*(_summarize(pending[start:start + SUMMARY_BATCH_SIZE]) for start in range(0, len(pending), SUMMARY_BATCH_SIZE)))
+    return summaries
 
 
-async def fetch_summary_from_duckduckgo(
+async def fetch_snippets_from_duckduckgo(
     query: str, 
     is_test_mode: bool, 
     region: str | None = None, 
     time_limit: str | None = None 
 ) -> Tuple[str, List[Dict[str, str]]]:
     """
-    Fetches snippets from DuckDuckGo and returns a summary and the list of sources.
+    Fetches snippets from DuckDuckGo and returns the formatted snippets (for summarize_snippets_batch)
+    and the list of sources. Both are empty when the search found nothing usable.
     """
     if is_test_mode:
-        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing DuckDuckGo Search and LLM calls.")
-        summary = await summarize_snippets_with_llm("", is_test_mode=True)
+        Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing DuckDuckGo Search.")
         sources = [{"title": "Test Source A", "url": "https://example.com/a", "source": "TestRobbReport", "date": "2025-10-19"}]
-        return summary, sources
+        return "Source: TestRobbReport\nDate: 2025-10-19\nTitle: Test Source A\nSnippet: Test snippet.", sources
 
     # --- Prepare parameters, passing defaults directly if needed ---
     time_param_for_api = None if time_limit and time_limit.lower() == 'any' else time_limit
@@ -205,63 +343,140 @@ async def fetch_summary_from_duckduckgo(
         Actor.log.warning("DuckDuckGo (LangChain) search returned no items.")
         return "", []
 
-    # --- Build prompt and sources list (no changes) ---
-    snippets_for_prompt = "\n---\n".join(
-        [f"Source: {item.get('source', 'Unknown')}\nDate: {item.get('date', 'N/A')}\nTitle: {item.get('title', 'N/A')}\nSnippet: {item.get('snippet', '')}" 
-         for item in search_results if item.get('snippet')]
-    )
-    
-    snippet_sources_list = [
-        {
-            "title": item.get('title', 'Unknown'), 
+    # --- Build prompt and sources list in one pass over the results ---
+    snippet_blocks = []
+    snippet_sources_list = []
+    for item in search_results:
+        snippet = item.get('snippet')
+        if not snippet:
+            continue
+        source = item.get('source', 'Unknown')
+        date = item.get('date', 'N/A')
+        title = item.get('title')
+        snippet_blocks.append(f"Source: {source}\nDate: {date}\nTitle: {title or 'N/A'}\nSnippet: {snippet}")
+        snippet_sources_list.append({
+            "title": title or 'Unknown',
             "url": item.get('link', 'N/A'),
-            "source": item.get('source', 'Unknown'),
-            "date": item.get('date', 'N/A')
-        } 
-        for item in search_results if item.get('snippet')
-    ]
+            "source": source,
+            "date": date
+        })
+    snippets_for_prompt = "\n---\n".join(snippet_blocks)
 
     Actor.log.info(f"Collected {len(snippet_sources_list)} snippets from DuckDuckGo News.")
     
-    summary = await summarize_snippets_with_llm(snippets_for_prompt, is_test_mode=False)
-    
-    return summary, snippet_sources_list
+    return snippets_for_prompt, snippet_sources_list
+
+
+ANALYSIS_BATCH_SIZE = 10
+
+# Analyses by normalized-summary digest, so syndicated copies of the same story are analyzed once per run
+_analysis_cache: Dict[str, Dict[str, Any]] = {}
+
+def _summary_key(summary: str) -> str:
+    """BLAKE2b-128 of the summary, lowercased with punctuation/whitespace runs collapsed."""
+    normalized = re.sub(r"\W+", " ", summary.lower()).strip()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
 
+# --- AMENDED SENTIMENT OPTIONS FOR LUXURY & LIFESTYLE ---
+SENTIMENT_OPTIONS = ("Brand Growth", "Market Downturn", "Acquisition/Partnership", "Informational")
+CATEGORY_LIST_STR = ", ".join(CATEGORIES)
+ANALYSIS_SYSTEM_PROMPT = "You are a professional Luxury and Lifestyle market analyst. Return a JSON object with an 'analyses' list holding 'index', 'sentiment', 'category', and 'key_entities' for each summary."
+# Static instructions come first and the numbered summaries last, so every request shares a
+# byte-identical prefix (eligible for OpenAI's automatic prompt caching)
+ANALYSIS_PROMPT_PREFIX = f'Based ONLY on each of the following Luxury and Lifestyle news summaries, provide for every summary:\n1. sentiment: The market dynamic or impact level ({", ".join(SENTIMENT_OPTIONS)}).\n2. category: The best category from this list: {CATEGORY_LIST_STR}.\n3. key_entities: A list of up to 3 key brands, events, companies, or people mentioned.\n\nOutput a single valid JSON object: {{"analyses": [{{"index": <summary number>, "sentiment": ..., "category": ..., "key_entities": [...]}}, ...]}} with one item per summary.\n\nSummaries:\n'
+# Strict structured output: the model can only return listed sentiments/categories, so no post-validation is needed
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "analyses": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "sentiment": {"type": "string", "enum": list(SENTIMENT_OPTIONS)},
+                            "category": {"type": "string", "enum": CATEGORIES},
+                            "key_entities": {"type": "array", "items": {"type": "string"}},
+                        },
+                        "required": ["index", "sentiment", "category", "key_entities"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["analyses"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-async def analyze_article_summary(summary: str, is_test_mode: bool) -> Dict[str, Any]:
+
+async def analyze_article_summaries(summaries: List[str], is_test_mode: bool) -> List[Dict[str, Any]]:
+    """
+    Analyzes the summaries with one chat completion per ANALYSIS_BATCH_SIZE summaries, so the system prompt
+    and category list are sent once per batch instead of once per article. Returns one analysis per summary, in order.
+    """
     if is_test_mode:
         # --- AMENDED TEST RESPONSE FOR LUXURY & LIFESTYLE ---
         Actor.log.warning("ADMIN TEST MODE: Bypassing LLM analysis call.")
-        return {"sentiment": "Brand Growth (TEST)", "category": "Automotive/Yachts/Aviation (TEST)", "key_entities": ["Ferrari", "Monaco Yacht Show", "LVMH"]}
+        return [{"sentiment": "Brand Growth (TEST)", "category": "Automotive/Yachts/Aviation (TEST)", "key_entities": ["Ferrari", "Monaco Yacht Show", "LVMH"]} for _ in summaries]
         # -----------------------------------------------
 
+    analyses = [{"sentiment": "N/A", "category": "N/A", "key_entities": []} for _ in summaries]
+    pending = [i for i, summary in enumerate(summaries) if summary and len(summary) >= 20]
+    if len(pending) < len(summaries):
+        Actor.log.warning(f"{len(summaries) - len(pending)} summaries too short for analysis. Skipping them.")
+
+    # Only the first summary of each digest that is not cached yet goes to the LLM
+    keys = {i: _summary_key(summaries[i]) for i in pending}
+    first_by_key: Dict[str, int] = {}
+    for i in pending:
+        if keys[i] not in _analysis_cache: first_by_key.setdefault(keys[i], i)
+    if len(first_by_key) < len(pending):
+        Actor.log.info(f"Reusing analyses for {len(pending) - len(first_by_key)} duplicate summaries.")
+    pending = list(first_by_key.values())
+
     client = init_openai()
-    if not summary or len(summary) < 20:
-        Actor.log.warning("Summary too short for analysis. Skipping LLM call.")
-        return {"sentiment": "N/A", "category": "N/A", "key_entities": []}
 
-    # --- AMENDED SENTIMENT OPTIONS FOR LUXURY & LIFESTYLE ---
-    sentiment_options = ["Brand Growth", "Market Downturn", "Acquisition/Partnership", "Informational"]
-    category_list_str = ", ".join(CATEGORIES)
-    prompt = f'Analyze the following Luxury and Lifestyle news summary: "{summary}"\n\nBased ONLY on the summary, provide a structured JSON output with:\n1. sentiment: The market dynamic or impact level ({", ".join(sentiment_options)}).\n2. category: The best category from this list: {category_list_str}.\n3. key_entities: A list of up to 3 key brands, events, companies, or people mentioned.\n\nOutput a single valid JSON object.'
+    async def _analyze(batch: List[int]) -> None:
+        prompt = ANALYSIS_PROMPT_PREFIX + "\n".join(f'{n}. "{summaries[i]}"' for n, i in enumerate(batch, start=1))
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": "You are a professional Luxury and Lifestyle market analyst. Return a JSON object with 'sentiment', 'category', and 'key_entities'."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            response_format={"type": "json_object"},
-        )
-        output_text = response.choices[0].message.content.strip()
-        parsed = json.loads(output_text)
-        entities = parsed.get("key_entities", [])
-        if not isinstance(entities, list): entities = [str(entities)] if entities else []
-        sentiment = str(parsed.get("sentiment", "N/A")).strip()
-        if sentiment not in sentiment_options: sentiment = "Informational"
-        return {"sentiment": sentiment, "category": str(parsed.get("category", "N/A")).strip(), "key_entities": entities}
-    except Exception as e:
-        Actor.log.warning(f"LLM analysis failed: {e}")
-        return {"sentiment": "Error", "category": "Error", "key_entities": []}
\ No newline at end of file
+        try:
+            response = await client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.0,
+                response_format=ANALYSIS_RESPONSE_FORMAT,
+            )
+            output_text = response.choices[0].message.content.strip()
+            answered = set()
+            for item in json.loads(output_text)["analyses"]:
+                n = item["index"]
+                if not 1 <= n <= len(batch): continue
+                analyses[batch[n - 1]] = {"sentiment": item["sentiment"], "category": item["category"], "key_entities": item["key_entities"]}
+                answered.add(n)
+            if len(answered) < len(batch):
+                Actor.log.warning(f"LLM analysis returned {len(answered)}/{len(batch)} results for this batch.")
+                for n, i in enumerate(batch, start=1):
+                    if n not in answered: analyses[i] = {"sentiment": "Error", "category": "Error", "key_entities": []}
+        except Exception as e:
+            Actor.log.warning(f"LLM analysis failed: {e}")
+            for i in batch: analyses[i] = {"sentiment": "Error", "category": "Error", "key_entities": []}
+
+    # Batches are independent, so their requests run concurrently
+    await asyncio.gather(*(_analyze(pending[start:start + ANALYSIS_BATCH_SIZE]) for start in range(0, len(pending), ANALYSIS_BATCH_SIZE)))
+
+    # Failed analyses are not cached, so a later call retries them
+    for i in pending:
+        if analyses[i]["sentiment"] != "Error": _analysis_cache[keys[i]] = analyses[i]
+    for i, key in keys.items():
+        if key in _analysis_cache: analyses[i] = dict(_analysis_cache[key])
+        else: analyses[i] = dict(analyses[first_by_key[key]])
+    return analyses
@@ -2,5 +2,14 @@ import asyncio
 
 from .main import main
 
+# uvloop (libuv-based event loop) is faster for the concurrent aiohttp/OpenAI calls; fall back to asyncio where it is unavailable
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Execute the Actor entry point.
-asyncio.run(main())
\ No newline at end of file
+if uvloop is not None:
+    uvloop.run(main())
+else:
+    asyncio.run(main())
@@ -3,6 +3,7 @@ import os
 import aiohttp
 import asyncio
 import hashlib
+import json
 from urllib.parse import quote_plus
 from apify import Actor
 from openai import AsyncOpenAI
@@ -12,6 +13,15 @@ from datetime import datetime
 API_STATE_KEY = "API_USAGE_STATE"
 PROCESSED_LINKS_STORE_NAME = "processed-links"
 FREE_TIER_DAILY_LIMIT = 200
+API_STATE_FLUSH_EVERY = 20  # requests between writes of the usage counter (plus one final write)
+# Submitted-but-unconsumed OpenAI batches (batch id + the records waiting for their summaries),
+# kept in a named store so they outlive the run
+BATCH_STATE_STORE_NAME = "openai-batches"
+BATCH_STATE_KEY = "OPENAI_BATCH_STATE"
+BATCH_POLL_INTERVAL = 30  # seconds between batch status checks
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_CONCURRENCY = 10  # max OpenAI summaries in flight per page
+KEY_WRITE_BATCH = 50  # processed-link keys written to the store per gather
 
 # --- Environment variables ---
 NEWSDATA_API_KEY = os.getenv("NEWSDATA_API_KEY")
@@ -22,7 +32,14 @@ openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
 
 def _get_safe_key(url: str) -> str:
-    """Creates a SHA-256 hash of a URL to use as a safe key."""
+    """Creates a BLAKE2b-128 hash of a URL to use as a safe key (dedup only, not cryptographic use)."""
+    # "b2-" namespaces these keys apart from the older SHA-256 ones (":" is not a valid store key character)
+    return "b2-" + hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _get_legacy_key(url: str) -> str:
+    """The SHA-256 key used before the "b2-" keys; still checked so links stored under it stay deduplicated."""
+    # TODO: drop once the processed-links store only holds "b2-" keys for the links still being returned
     return hashlib.sha256(url.encode('utf-8')).hexdigest()
 
 
@@ -39,6 +56,23 @@ async def fetch_json(session, url):
         return None, False
 
 
+def _summary_request_body(title: str, description: str) -> dict:
+    """Chat completion request body for summarizing one article (shared by direct and batch calls)."""
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "Summarize the following article briefly in one or two sentences.",
+            },
+            {
+                "role": "user",
+                "content": f"Title: {title}\n\nContent: {description}",
+            },
+        ],
+    }
+
+
 async def summarize_with_openai(title: str, description: str) -> str | None:
     """Summarize article text using OpenAI (new SDK syntax)."""
     if not openai_client:
@@ -46,19 +80,7 @@ async def summarize_with_openai(title: str, description: str) -> str | None:
 
     try:
         Actor.log.info(f"Summarizing: {title[:60]}...")
-        response = await openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Summarize the following article briefly in one or two sentences.",
-                },
-                {
-                    "role": "user",
-                    "content": f"Title: {title}\n\nContent: {description}",
-                },
-            ],
-        )
+        response = await openai_client.chat.completions.create(**_summary_request_body(title, description))
         return response.choices[0].message.content.strip()
 
     except Exception as e:
@@ -66,6 +88,104 @@ async def summarize_with_openai(title: str, description: str) -> str | None:
         return None
 
 
+async def summarize_bounded(title: str, description: str, sem: asyncio.Semaphore) -> str | None:
+    """Runs `summarize_with_openai` with at most SUMMARY_CONCURRENCY calls in flight."""
+    async with sem:
+        return await summarize_with_openai(title, description)
+
+
+async def submit_summary_batch(records: list[dict]) -> str | None:
+    """
+    Uploads one summarization request per record as a JSONL file and starts an OpenAI batch
+    (50% cheaper, no RPM limit, completes within 24h). Returns the batch id, or None if submission failed.
+    """
+    lines = [
+        json.dumps({
+            "custom_id": record["custom_id"],
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _summary_request_body(record["title"], record["description"]),
+        })
+        for record in records
+    ]
+    try:
+        batch_file = await openai_client.files.create(
+            file=("summaries.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = await openai_client.batches.create(
+            input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        Actor.log.info(f"Submitted OpenAI batch {batch.id} with {len(records)} summarization requests.")
+        return batch.id
+    except Exception as e:
+        Actor.log.warning(f"OpenAI batch submission failed: {e}")
+        return None
+
+
+async def collect_summary_batch(pending: dict, processed_links_store) -> bool:
+    """
+    Checks a submitted batch; once it has finished, attaches its summaries to the waiting records,
+    pushes them and marks their links as processed. Returns True if the batch is done (records pushed),
+    False if it is still running.
+    """
+    batch_id = pending["batch_id"]
+    try:
+        batch = await openai_client.batches.retrieve(batch_id)
+    except Exception as e:
+        Actor.log.warning(f"Could not retrieve OpenAI batch {batch_id}: {e}")
+        return False
+
+    if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+        Actor.log.info(f"OpenAI batch {batch_id} is still {batch.status}.")
+        return False
+
+    if batch.status != "completed":
+        # Expired/cancelled batches still carry the requests that finished in time
+        Actor.log.warning(f"OpenAI batch {batch_id} ended with status '{batch.status}'. Using any partial results.")
+
+    summaries = {}
+    if batch.output_file_id:
+        try:
+            output = await openai_client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                body = (row.get("response") or {}).get("body") or {}
+                choices = body.get("choices") or []
+                if choices:
+                    summaries[row.get("custom_id")] = choices[0]["message"]["content"].strip()
+        except Exception as e:
+            Actor.log.warning(f"Failed to read results of OpenAI batch {batch_id}: {e}")
+
+    # Records without a result are pushed without a summary rather than held back
+    records = pending["records"]
+    safe_keys = []
+    for record in records:
+        safe_keys.append(record.pop("custom_id"))
+        record["summary"] = summaries.get(safe_keys[-1])
+    await Actor.push_data(records)
+    await flush_seen_keys(processed_links_store, safe_keys)
+    Actor.log.info(f"Pushed {len(records)} records from OpenAI batch {batch_id} ({len(summaries)} summarized).")
+    return True
+
+
+async def load_seen_keys(store) -> set[str]:
+    """Reads all processed-link keys once, so dedup checks are in-memory lookups."""
+    seen = set()
+    async for item in store.iterate_keys():
+        seen.add(item.key)
+    return seen
+
+
+async def flush_seen_keys(store, pending_writes: list[str]) -> None:
+    """Marks the buffered links as processed with concurrent writes, then empties the buffer."""
+    if not pending_writes:
+        return
+    await asyncio.gather(*(store.set_value(key=safe_key, value=True) for safe_key in pending_writes))
+    pending_writes.clear()
+
+
 async def main() -> None:
     async with Actor:
         input_data = await Actor.get_input() or {}
@@ -79,6 +199,9 @@ async def main() -> None:
         use_openai = bool(input_data.get("useOpenAI", False))
         priority_domain = input_data.get("priorityDomain", "top")
         enable_paid_tier = bool(input_data.get("enablePaidTier", False))
+        # Batch mode: summaries go through the OpenAI Batch API; records are pushed once their batch is done
+        batch_mode = use_openai and openai_client is not None and bool(input_data.get("batchMode", False))
+        batch_wait_minutes = int(input_data.get("batchWaitMinutes", 0))
 
         # --- API Usage State Management ---
         today_str = datetime.utcnow().strftime('%Y-%m-%d')
@@ -96,6 +219,22 @@ async def main() -> None:
 
         # --- Deduplication setup ---
         processed_links_store = await Actor.open_key_value_store(name=PROCESSED_LINKS_STORE_NAME)
+        seen = await load_seen_keys(processed_links_store)
+        Actor.log.info(f"Loaded {len(seen)} processed links.")
+        pending_writes = []  # new keys not yet written to the store
+
+        # --- Consume OpenAI batches submitted by earlier runs ---
+        batch_store = await Actor.open_key_value_store(name=BATCH_STATE_STORE_NAME)
+        pending_batches = await batch_store.get_value(BATCH_STATE_KEY) or []
+        if pending_batches and openai_client:
+            Actor.log.info(f"Checking {len(pending_batches)} pending OpenAI batch(es) from earlier runs.")
+            pending_batches = [
+                p for p in pending_batches if not await collect_summary_batch(p, processed_links_store)
+            ]
+            await batch_store.set_value(BATCH_STATE_KEY, pending_batches)
+        # Links still waiting in a batch are only marked processed once pushed; skip them in the meantime
+        for pending in pending_batches:
+            seen.update(record["custom_id"] for record in pending["records"])
 
         # --- Prepare query ---
         query = quote_plus(keywords.replace(",", " OR ").strip())
@@ -103,88 +242,173 @@ async def main() -> None:
         articles_fetched = 0
         max_pages = 200  # Safety limit for requests in a single run
         next_page = None
+        batch_records = []  # records waiting for a Batch API summary
+        summary_sem = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+        def start_page_fetch(session: aiohttp.ClientSession, page: int, next_page: str | None) -> asyncio.Task:
+            """Builds the NewsData API URL for `page` and starts fetching it in the background."""
+            url = (
+                f"https://newsdata.io/api/1/news?"
+                f"apikey={NEWSDATA_API_KEY}&q={query}&category={category}"
+                f"&country={country}&language={language}&prioritydomain={priority_domain}"
+            )
+            if next_page:
+                url += f"&page={next_page}"
+
+            Actor.log.info(f"Fetching page {page} -> {url}")
+            return asyncio.create_task(fetch_json(session, url))
+
+        # Request for the next page, started while the current page is processed
+        prefetch = None
 
         async with aiohttp.ClientSession() as session:
-            for page in range(1, max_pages + 1):
-                if articles_fetched >= max_articles:
-                    Actor.log.info(f"Target of {max_articles} articles reached. Stopping.")
-                    break
-
-                # --- Check API daily limit ---
-                if not enable_paid_tier and requests_today >= FREE_TIER_DAILY_LIMIT:
-                    Actor.log.warning(f"Free daily API request limit of {FREE_TIER_DAILY_LIMIT} reached. "
-                                      "Enable the paid tier option to continue.")
-                    break
-
-                # --- Build NewsData API URL ---
-                url = (
-                    f"https://newsdata.io/api/1/news?"
-                    f"apikey={NEWSDATA_API_KEY}&q={query}&category={category}"
-                    f"&country={country}&language={language}&prioritydomain={priority_domain}"
-                )
-                if next_page:
-                    url += f"&page={next_page}"
-
-                Actor.log.info(f"Fetching page {page} -> {url}")
-
-                data, success = await fetch_json(session, url)
-
-                # --- Increment and save API request count on success ---
-                if success:
-                    requests_today += 1
-                    api_state["requests_today"] = requests_today
-                    await Actor.set_value(API_STATE_KEY, api_state)
-                    Actor.log.info(f"API request successful. Today's count: {requests_today}/{FREE_TIER_DAILY_LIMIT}")
-
-                if not data:
-                    Actor.log.warning(f"No data returned for page {page}.")
-                    break
-
-                new_articles = data.get("results", [])
-                if not isinstance(new_articles, list) or not new_articles:
-                    Actor.log.info(f"No valid articles on page {page}. Stopping.")
-                    break
-
-                # --- Process and store each article ---
-                for article in new_articles:
+            try:
+                for page in range(1, max_pages + 1):
                     if articles_fetched >= max_articles:
+                        Actor.log.info(f"Target of {max_articles} articles reached. Stopping.")
+                        break
+
+                    if prefetch is None:
+                        # --- Check API daily limit ---
+                        if not enable_paid_tier and requests_today >= FREE_TIER_DAILY_LIMIT:
+                            Actor.log.warning(f"Free daily API request limit of {FREE_TIER_DAILY_LIMIT} reached. "
+                                              "Enable the paid tier option to continue.")
+                            break
+                        prefetch = start_page_fetch(session, page, next_page)
+
+                    data, success = await prefetch
+                    prefetch = None
+
+                    # --- Increment API request count on success (persisted periodically and on exit) ---
+                    if success:
+                        requests_today += 1
+                        api_state["requests_today"] = requests_today
+                        if requests_today % API_STATE_FLUSH_EVERY == 0:
+                            await Actor.set_value(API_STATE_KEY, api_state)
+                        Actor.log.info(f"API request successful. Today's count: {requests_today}/{FREE_TIER_DAILY_LIMIT}")
+
+                    if not data:
+                        Actor.log.warning(f"No data returned for page {page}.")
+                        break
+
+                    new_articles = data.get("results", [])
+                    if not isinstance(new_articles, list) or not new_articles:
+                        Actor.log.info(f"No valid articles on page {page}. Stopping.")
                         break
-                    
-                    link = article.get("link")
-                    if not link:
-                        continue
 
                     # --- Deduplication Check using a safe key ---
-                    safe_key = _get_safe_key(link)
-                    if await processed_links_store.get_value(key=safe_key):
-                        Actor.log.info(f"Skipping duplicate article: {link}")
-                        continue
-
-                    title = article.get("title", "Untitled")
-                    description = article.get("description", "")
-                    
-                    summary = None
-                    if use_openai and description:
-                        summary = await summarize_with_openai(title, description)
-
-                    await Actor.push_data({
-                        "title": title,
-                        "link": link,
-                        "description": description,
-                        "summary": summary,
-                        "source": "newsdata.io",
-                        "page": page,
-                    })
-                    articles_fetched += 1
-
-                    # Mark link as processed to prevent future duplicates
-                    await processed_links_store.set_value(key=safe_key, value=True)
-
-                # --- Pagination handling ---
-                next_page = data.get("nextPage")
-                if not next_page:
-                    Actor.log.info("No nextPage token found — reached end of results.")
-                    break
+                    page_articles = []
+                    page_keys = set()
+                    for article in new_articles:
+                        if not article.get("link"):
+                            continue
+                        safe_key = _get_safe_key(article["link"])
+                        if safe_key in seen or safe_key in page_keys or _get_legacy_key(article["link"]) in seen:
+                            Actor.log.info(f"Skipping duplicate article: {article['link']}")
+                            continue
+                        page_keys.add(safe_key)
+                        page_articles.append((article, safe_key))
+                    page_articles = page_articles[:max_articles - articles_fetched]
+
+                    # --- Prefetch the next page while this one is summarized and stored ---
+                    # Only when it will be needed and the free-tier budget allows another request
+                    next_page = data.get("nextPage")
+                    if (
+                        next_page
+                        and page < max_pages
+                        and articles_fetched + len(page_articles) < max_articles
+                        and (enable_paid_tier or requests_today < FREE_TIER_DAILY_LIMIT)
+                    ):
+                        prefetch = start_page_fetch(session, page + 1, next_page)
+
+                    records = [
+                        {
+                            "title": article.get("title", "Untitled"),
+                            "link": article["link"],
+                            "description": article.get("description", ""),
+                            "summary": None,
+                            "source": "newsdata.io",
+                            "page": page,
+                        }
+                        for article, _ in page_articles
+                    ]
+
+                    # --- Summarize the page's articles concurrently ---
+                    to_summarize = [
+                        record for record in records if use_openai and not batch_mode and record["description"]
+                    ]
+                    summaries = await asyncio.gather(
+                        *(summarize_bounded(r["title"], r["description"], summary_sem) for r in to_summarize),
+                        return_exceptions=True
+                    )
+                    for record, summary in zip(to_summarize, summaries):
+                        record["summary"] = None if isinstance(summary, BaseException) else summary
+
+                    # --- Store each article (one dataset push per page) ---
+                    page_rows = []
+                    for record, (_, safe_key) in zip(records, page_articles):
+                        if batch_mode and record["description"]:
+                            # Summarized later via the Batch API; the link key doubles as the request's custom_id
+                            batch_records.append({**record, "custom_id": safe_key})
+                        else:
+                            page_rows.append(record)
+                            pending_writes.append(safe_key)
+                        seen.add(safe_key)
+                        articles_fetched += 1
+
+                    if page_rows:
+                        await Actor.push_data(page_rows)
+
+                    # Pushed links are marked as processed to prevent future duplicates;
+                    # batch-mode links are marked by collect_summary_batch once their records are pushed
+
+                    if len(pending_writes) >= KEY_WRITE_BATCH:
+                        await flush_seen_keys(processed_links_store, pending_writes)
+
+                    # --- Pagination handling ---
+                    if not next_page:
+                        Actor.log.info("No nextPage token found — reached end of results.")
+                        break
+            finally:
+                # A request still in flight (e.g. after an error) may already be billed: let it finish and count it
+                if prefetch is not None:
+                    try:
+                        _, success = await prefetch
+                    except Exception:
+                        success = False
+                    if success:
+                        requests_today += 1
+                        api_state["requests_today"] = requests_today
+                # Keys of everything stored so far, and the usage counter, are persisted even if the run fails
+                await flush_seen_keys(processed_links_store, pending_writes)
+                await Actor.set_value(API_STATE_KEY, api_state)
+
+        # --- Submit the collected summaries as one OpenAI batch ---
+        if batch_records:
+            batch_id = await submit_summary_batch(batch_records)
+            if batch_id:
+                pending = {"batch_id": batch_id, "records": batch_records}
+                pending_batches.append(pending)
+                await batch_store.set_value(BATCH_STATE_KEY, pending_batches)
+
+                # Optionally wait for the batch; otherwise a later run consumes it
+                deadline = asyncio.get_running_loop().time() + batch_wait_minutes * 60
+                while asyncio.get_running_loop().time() < deadline:
+                    await asyncio.sleep(BATCH_POLL_INTERVAL)
+                    if await collect_summary_batch(pending, processed_links_store):
+                        pending_batches.remove(pending)
+                        await batch_store.set_value(BATCH_STATE_KEY, pending_batches)
+                        break
+                else:
+                    Actor.log.info(
+                        f"OpenAI batch {batch_id} saved in store '{BATCH_STATE_STORE_NAME}'; "
+                        f"the next run will attach its summaries."
+                    )
+            else:
+                # Submission failed: push the records without summaries rather than losing them
+                safe_keys = [record.pop("custom_id") for record in batch_records]
+                await Actor.push_data(batch_records)
+                await flush_seen_keys(processed_links_store, safe_keys)
 
         Actor.log.info(f"🎉 Finished. Fetched {articles_fetched} new articles in this run.")
 
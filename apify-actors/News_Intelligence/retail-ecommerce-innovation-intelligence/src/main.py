@@ -1,12 +1,12 @@
 import os
 from apify import Actor
 from langgraph.graph import StateGraph
-from typing import List, TypedDict
+from typing import List, Optional, TypedDict
 import asyncio
 import hashlib
 import re # Added for HTML stripping helper function
 from .models import RSSFeed, Article, InputConfig, DatasetRecord, SnippetSource
-from .tools import fetch_rss_feeds, fetch_summary_from_duckduckgo, analyze_article_summary
+from .tools import fetch_rss_feeds, fetch_summary_from_duckduckgo, analyze_article_summaries, save_semantic_cache
 from apify.storages import KeyValueStore
 
 # --- HELPER FUNCTION FOR CLEANING (REQUIRED FOR FALLBACK) ---
@@ -26,6 +26,10 @@ def strip_html_tags(text):
 class WorkflowState(TypedDict):
     config: InputConfig
     articles: List[Article]
+    # Per-article results, aligned with `articles` (summary "" = article is skipped)
+    summaries: List[str]
+    snippet_sources: List[Optional[list]]
+    analyses: List[dict]
     processed_count: int
     processed_urls_store: KeyValueStore
 
@@ -33,7 +37,7 @@ async def rss_fetcher(state: WorkflowState) -> dict:
     config = state["config"]
     processed_urls_store = state["processed_urls_store"]
 
-    all_articles_from_feed = fetch_rss_feeds(
+    all_articles_from_feed = await fetch_rss_feeds(
         config.source,
         custom_url=config.customFeedUrl,
         max_articles=config.maxArticles
@@ -59,11 +63,11 @@ async def rss_fetcher(state: WorkflowState) -> dict:
     Actor.log.info(f"Processing {len(new_articles)} total articles (including recycled ones if needed).")
     return {"articles": new_articles, "processed_count": 0}
     
-async def process_and_save_article(state: WorkflowState) -> dict:
+async def summarize_article(state: WorkflowState) -> dict:
+    """Finds the best available summary of the next article; analysis happens afterwards for all articles at once."""
     articles = state["articles"]
     config = state["config"]
     processed_count = state["processed_count"]
-    processed_urls_store = state["processed_urls_store"]
 
     if processed_count >= len(articles):
         Actor.log.info("No more articles to process.")
@@ -107,32 +111,58 @@ async def process_and_save_article(state: WorkflowState) -> dict:
         
     if not ai_overview:
         Actor.log.error(f"❌ No summary could be generated for article {processed_count + 1}. Skipping this article.")
-        return {"processed_count": processed_count + 1}
+        ai_overview, snippet_sources = "", None
 
-    # Proceed with saving the best available summary (ai_overview)
-    art.summary = ai_overview
-    analysis_results = await analyze_article_summary(art.summary, config.runTestMode)
-    
-    dataset_record = DatasetRecord(
-        source=art.source,
-        title=art.title,
-        url=art.link,
-        published=art.published,
-        summary=art.summary,
-        sentiment=analysis_results.get("sentiment"),
-        category=analysis_results.get("category"),
-        key_entities=analysis_results.get("key_entities"),
-        # Only include snippet_sources if search was performed and returned results
-        snippet_sources=snippet_sources if snippet_sources else None
-    ).model_dump()
-
-    await Actor.push_data([dataset_record])
-    Actor.log.info(f"Pushed record for '{art.title[:50]}...' to dataset.")
-
-    url_key = hashlib.md5(str(art.link).encode('utf-8')).hexdigest()
-    await processed_urls_store.set_value(key=url_key, value=True)
-
-    return {"processed_count": processed_count + 1}
+    return {
+        "summaries": state["summaries"] + [ai_overview],
+        "snippet_sources": state["snippet_sources"] + [snippet_sources],
+        "processed_count": processed_count + 1
+    }
+
+async def batch_analyze(state: WorkflowState) -> dict:
+    """Analyzes all collected summaries together instead of one LLM call per article."""
+    analyses = await analyze_article_summaries(state["summaries"], state["config"].runTestMode)
+    return {"analyses": analyses}
+
+async def save_articles(state: WorkflowState) -> dict:
+    """Pushes the records of all summarized articles in one call, then marks their URLs as processed."""
+    processed_urls_store = state["processed_urls_store"]
+
+    records = []
+    saved_articles = []
+    for art, summary, snippet_sources, analysis_results in zip(
+        state["articles"], state["summaries"], state["snippet_sources"], state["analyses"]
+    ):
+        if not summary:
+            continue
+        # Proceed with saving the best available summary
+        art.summary = summary
+        records.append(DatasetRecord(
+            source=art.source,
+            title=art.title,
+            url=art.link,
+            published=art.published,
+            summary=art.summary,
+            sentiment=analysis_results.get("sentiment"),
+            category=analysis_results.get("category"),
+            key_entities=analysis_results.get("key_entities"),
+            # Only include snippet_sources if search was performed and returned results
+            snippet_sources=snippet_sources if snippet_sources else None
+        ).model_dump())
+        saved_articles.append(art)
+
+    if not records:
+        Actor.log.warning("No records to push.")
+        return {}
+
+    await Actor.push_data(records)
+    Actor.log.info(f"Pushed {len(records)} records to dataset.")
+
+    await asyncio.gather(*(
+        processed_urls_store.set_value(key=hashlib.md5(str(art.link).encode('utf-8')).hexdigest(), value=True)
+        for art in saved_articles
+    ))
+    return {}
 
 def should_continue(state: WorkflowState) -> str:
     articles = state["articles"]
@@ -158,23 +188,34 @@ async def main():
 
         graph = StateGraph(WorkflowState)
         graph.add_node("RSSFetcher", rss_fetcher)
-        graph.add_node("ProcessAndSaveArticle", process_and_save_article)
+        graph.add_node("SummarizeArticle", summarize_article)
+        graph.add_node("BatchAnalyze", batch_analyze)
+        graph.add_node("SaveArticles", save_articles)
         graph.set_entry_point("RSSFetcher")
 
-        graph.add_conditional_edges("RSSFetcher", should_continue, {"continue": "ProcessAndSaveArticle", "end": "__end__"})
-        graph.add_conditional_edges("ProcessAndSaveArticle", should_continue, {"continue": "ProcessAndSaveArticle", "end": "__end__"})
+        graph.add_conditional_edges("RSSFetcher", should_continue, {"continue": "SummarizeArticle", "end": "__end__"})
+        graph.add_conditional_edges("SummarizeArticle", should_continue, {"continue": "SummarizeArticle", "end": "BatchAnalyze"})
+        graph.add_edge("BatchAnalyze", "SaveArticles")
+        graph.add_edge("SaveArticles", "__end__")
 
         app = graph.compile()
         Actor.log.info("Starting Retail & Ecommerce Intelligence pipeline.")
 
-        recursion_config = {"recursion_limit": config.maxArticles + 5}
-
-        await app.ainvoke({
-            "config": config,
-            "articles": [],
-            "processed_count": 0,
-            "processed_urls_store": processed_urls_store
-        }, config=recursion_config)
+        recursion_config = {"recursion_limit": config.maxArticles + 7}
+
+        try:
+            await app.ainvoke({
+                "config": config,
+                "articles": [],
+                "summaries": [],
+                "snippet_sources": [],
+                "analyses": [],
+                "processed_count": 0,
+                "processed_urls_store": processed_urls_store
+            }, config=recursion_config)
+        finally:
+            # One store write per run for the semantic analysis cache
+            await save_semantic_cache()
 
         Actor.log.info("🎯 Retail & Ecommerce Intelligence pipeline completed successfully!")
 
@@ -2,18 +2,26 @@ import feedparser
 import re
 import os
 import json
+import time
+import hashlib
 import asyncio
+import functools
+import aiohttp
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Tuple
 from apify import Actor
 from apify_client import ApifyClient
-from openai import OpenAI
+from openai import AsyncOpenAI
 from .models import RSSFeed
 from langchain_community.tools import DuckDuckGoSearchResults
 from langchain_community.utilities import DuckDuckGoSearchAPIWrapper 
 
-def init_openai() -> OpenAI:
+@functools.lru_cache(maxsize=1)
+def init_openai() -> AsyncOpenAI:
     # This function relies on the OPENAI_API_KEY environment variable being set.
-    return OpenAI()
+    # One shared async client: its connection pool is reused and calls do not block the event loop.
+    return AsyncOpenAI()
 
 CATEGORIES = [
     "Logistics/Supply Chain", "Digital Marketing/SEO", "Store Operations/Tech",
@@ -21,7 +29,48 @@ CATEGORIES = [
     "Innovation/AI", "Informational/General"
 ]
 
-def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10) -> List[RSSFeed]:
+# Maximum number of feeds downloaded at the same time
+RSS_FETCH_CONCURRENCY = 8
+FEED_TIMEOUT_SECONDS = 15
+FEED_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; RetailEcommerceIntelligence/1.0; +https://apify.com)"}
+
+async def _download_feeds(urls: List[str]) -> List[bytes | BaseException]:
+    """Downloads all feed bodies concurrently (at most RSS_FETCH_CONCURRENCY at once); results keep the `urls` order."""
+    sem = asyncio.Semaphore(RSS_FETCH_CONCURRENCY)
+
+    async with aiohttp.ClientSession(headers=FEED_HEADERS, timeout=aiohttp.ClientTimeout(total=FEED_TIMEOUT_SECONDS)) as session:
+        async def _bounded_get(feed_url: str) -> bytes:
+            async with sem:
+                Actor.log.info(f"Downloading feed: {feed_url}")
+                async with session.get(feed_url) as response:
+                    response.raise_for_status()
+                    return await response.read()
+
+        return await asyncio.gather(*[_bounded_get(u) for u in urls], return_exceptions=True)
+
+# Feed parsing is CPU-bound and independent per feed, so it runs across cores; created on first use
+_parse_pool: ProcessPoolExecutor | None = None
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _parse_pool
+
+def _parse_feed_bytes(body: bytes) -> Tuple[str | None, List[Dict[str, Any]]]:
+    """
+    Parses one feed body in a worker process. Only the feed title and the entry fields used here
+    are returned, which keeps the result small to pickle back to the main process.
+    """
+    parsed = feedparser.parse(body)
+    entries = [
+        {"title": entry.get("title", ""), "link": entry.get("link", ""),
+         "published": entry.get("published"), "summary": entry.get("summary")}
+        for entry in parsed.entries
+    ]
+    return parsed.feed.get("title"), entries
+
+async def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10) -> List[RSSFeed]:
     feed_map = {
         "retailnewsai": "https://retailnews.ai/feed/",
         "retailinnovation": "https://retail-innovation.com/feed/",
@@ -57,14 +106,28 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10)
     else:
         if selected := feed_map.get(source): urls.append(selected)
 
-    parsed_feeds = []
-    for feed_url in urls:
+    # Downloads overlap, so network time is set by the slowest feeds instead of their sum; the
+    # downloaded bodies are then parsed in parallel in the process pool
+    bodies = await _download_feeds(urls)
+
+    loop = asyncio.get_running_loop()
+    pool = _get_parse_pool()
+
+    async def _parse(feed_url: str, body: bytes | BaseException) -> Tuple[str | None, List[Dict[str, Any]]]:
+        if isinstance(body, BaseException): raise body
         Actor.log.info(f"Parsing feed: {feed_url}")
+        return await loop.run_in_executor(pool, _parse_feed_bytes, body)
+
+    results = await asyncio.gather(*[_parse(u, b) for u, b in zip(urls, bodies)], return_exceptions=True)
+
+    parsed_feeds = []
+    for feed_url, result in zip(urls, results):
         try:
-            parsed = feedparser.parse(feed_url)
-            if parsed.entries:
-                source_title = parsed.feed.get("title", f"Unknown ({feed_url})")
-                parsed_feeds.append((iter(parsed.entries), source_title))
+            if isinstance(result, BaseException): raise result
+            feed_title, entries = result
+            if entries:
+                source_title = feed_title or f"Unknown ({feed_url})"
+                parsed_feeds.append((iter(entries), source_title))
             else: Actor.log.warning(f"Feed {feed_url} returned no entries.")
         except Exception as e: Actor.log.warning(f"Failed to parse feed {feed_url}: {e}")
 
@@ -94,16 +157,39 @@ def fetch_rss_feeds(source: str, custom_url: str = None, max_articles: int = 10)
     return articles
 
 
+# All fixed instructions live in the system messages and the per-article content comes last, so every
+# request of a run shares a byte-identical prefix (eligible for OpenAI's automatic prompt caching)
+SUMMARY_SYSTEM_PROMPT = (
+    "You are a Retail and Ecommerce news summarization assistant. Your goal is to synthesize a single, coherent paragraph from multiple sourced snippets. "
+    "Base your summary *only* on the snippets. If you detect notable differences in reporting between sources, briefly mention it.\n\n"
+    "Synthesize a concise, neutral, one-paragraph summary of the main Retail or Ecommerce news event from the search results given by the user. "
+    "Note the different sources and dates, and **briefly mention any significant variations in their reporting (e.g., conflicting facts, different sentiment)**."
+)
+
+SENTIMENT_OPTIONS = ("Highly Disruptive", "Growth Trend", "Informational")
+CATEGORY_LIST_STR = ", ".join(CATEGORIES)
+ANALYSIS_SYSTEM_PROMPT = (
+    "You are a professional Retail and Ecommerce analyst. The user sends a JSON array of Retail and Ecommerce news summaries, each with an \"id\".\n\n"
+    "Based ONLY on each summary, provide a structured analysis with:\n"
+    f"1. sentiment: The business trend or impact level ({', '.join(SENTIMENT_OPTIONS)}).\n"
+    f"2. category: The best category from this list: {CATEGORY_LIST_STR}.\n"
+    "3. key_entities: A list of up to 3 key brands, platforms, technologies, or people mentioned.\n\n"
+    'Output a single valid JSON object {"results": [...]} with one item per summary, holding its "id", "sentiment", "category", and "key_entities", for example:\n'
+    '{"results": [{"id": 0, "sentiment": "Growth Trend", "category": "Fintech/Payment Systems", "key_entities": ["Stripe", "Shopify"]}]}'
+)
+# Summaries analyzed per chat completion; bounds the length of each JSON response
+ANALYSIS_BATCH_SIZE = 20
+
 async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
     if is_test_mode: return "This is a test summary generated from dummy search snippets. It notes that Source A reported a new supply chain automation breakthrough while Source B warned about the security risks of the technology, showcasing a variation in reporting."
 
     client = init_openai()
-    prompt = f"Synthesize a concise, neutral, one-paragraph summary of the main Retail or Ecommerce news event from the following search results. Note the different sources and dates, and **briefly mention any significant variations in their reporting (e.g., conflicting facts, different sentiment)**.\n\nSnippets:\n---\n{snippets}\n---"
+    prompt = f"Snippets:\n---\n{snippets}\n---"
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-3.5-turbo-0125",
             messages=[
-                {"role": "system", "content": "You are a Retail and Ecommerce news summarization assistant. Your goal is to synthesize a single, coherent paragraph from multiple sourced snippets. Base your summary *only* on the snippets. If you detect notable differences in reporting between sources, briefly mention it."},
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.2,
@@ -116,6 +202,16 @@ async def summarize_snippets_with_llm(snippets: str, is_test_mode: bool) -> str:
         return ""
 
 
+# Summaries (and sources) of earlier DuckDuckGo searches, kept across runs
+DDG_CACHE_STORE_NAME = "ddg-summary-cache-retail"  # per-actor: named stores are shared across the account
+# How long a cached search stays valid, by timeLimit; searches without a time limit use the default
+DDG_CACHE_TTL_SECONDS = {"d": 86400, "w": 604800, "m": 2592000}
+DDG_CACHE_DEFAULT_TTL_SECONDS = 604800
+
+def _ddg_cache_key(query: str, region: str | None, time_limit: str | None) -> str:
+    """BLAKE2b-128 of the search parameters; store keys may not contain the query's characters."""
+    return hashlib.blake2b(f"{region}|{time_limit}|{query}".encode('utf-8'), digest_size=16).hexdigest()
+
 async def fetch_summary_from_duckduckgo(
     query: str, 
     is_test_mode: bool, 
@@ -124,6 +220,35 @@ async def fetch_summary_from_duckduckgo(
 ) -> Tuple[str, List[Dict[str, str]]]:
     """
     Fetches snippets from DuckDuckGo and returns a summary and the list of sources.
+    Results are cached per (query, region, time_limit) for a TTL that follows the time limit.
+    """
+    if is_test_mode:
+        return await _search_and_summarize(query, is_test_mode, region, time_limit)
+
+    cache_store = await Actor.open_key_value_store(name=DDG_CACHE_STORE_NAME)
+    cache_key = _ddg_cache_key(query, region, time_limit)
+    ttl = DDG_CACHE_TTL_SECONDS.get((time_limit or "").lower(), DDG_CACHE_DEFAULT_TTL_SECONDS)
+
+    cached = await cache_store.get_value(cache_key)
+    if cached and time.time() - cached.get("ts", 0) < ttl:
+        Actor.log.info(f"Using cached DuckDuckGo summary for: {query[:60]}...")
+        return cached["summary"], cached["sources"]
+
+    summary, sources = await _search_and_summarize(query, is_test_mode, region, time_limit)
+    # Empty results are not cached, so the next run searches again
+    if summary:
+        await cache_store.set_value(cache_key, {"summary": summary, "sources": sources, "ts": time.time()})
+    return summary, sources
+
+
+async def _search_and_summarize(
+    query: str, 
+    is_test_mode: bool, 
+    region: str | None = None, 
+    time_limit: str | None = None 
+) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Runs the DuckDuckGo search and summarizes its snippets (uncached).
     """
     if is_test_mode:
         Actor.log.warning("ADMIN TEST MODE ENABLED. Bypassing DuckDuckGo Search and LLM calls.")
@@ -184,37 +309,168 @@ async def fetch_summary_from_duckduckgo(
     return summary, snippet_sources_list
 
 
-async def analyze_article_summary(summary: str, is_test_mode: bool) -> Dict[str, Any]:
+# Semantic cache of analyses: near-duplicate summaries (the same wire story republished) reuse an earlier analysis
+SEMANTIC_CACHE_STORE_NAME = "analysis-semantic-cache"
+SEMANTIC_CACHE_EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_DIMENSIONS = 256  # shortened embeddings; stored as float16, ~5 MB at the entry cap
+SEMANTIC_CACHE_THRESHOLD = 0.92  # minimum cosine similarity for a hit
+SEMANTIC_CACHE_MAX_ENTRIES = 10000  # oldest entries are evicted first
+_SEMANTIC_VECTORS_KEY = "vectors"
+_SEMANTIC_ANALYSES_KEY = "analyses"
+
+# Loaded from the store on first use: unit-normalized embeddings (float32 in memory, one row per entry, oldest first)
+# and the analysis stored for each row
+_semantic_vectors: np.ndarray | None = None
+_semantic_analyses: List[Dict[str, Any]] = []
+_semantic_dirty = False
+
+async def _load_semantic_cache() -> None:
+    global _semantic_vectors, _semantic_analyses
+    if _semantic_vectors is not None:
+        return
+    store = await Actor.open_key_value_store(name=SEMANTIC_CACHE_STORE_NAME)
+    blob = await store.get_value(_SEMANTIC_VECTORS_KEY)
+    meta = await store.get_value(_SEMANTIC_ANALYSES_KEY) or {}
+    analyses = meta.get("analyses", [])
+    # Caches written with another vector layout (e.g. full-size float32 embeddings) are dropped and rebuilt
+    if blob and analyses and meta.get("dtype") == "float16" and meta.get("dim") == SEMANTIC_CACHE_DIMENSIONS:
+        _semantic_vectors = np.frombuffer(blob, dtype=np.float16).reshape(len(analyses), meta["dim"]).astype(np.float32)
+        _semantic_analyses = analyses
+        Actor.log.info(f"Loaded {len(analyses)} entries from the semantic analysis cache.")
+    else:
+        _semantic_vectors = np.empty((0, 0), dtype=np.float32)
+        _semantic_analyses = []
+
+def _semantic_lookup(vector: np.ndarray) -> Dict[str, Any] | None:
+    """Returns the analysis of the most similar cached summary, if it is similar enough."""
+    if not _semantic_analyses or _semantic_vectors.shape[1] != vector.shape[0]:
+        return None
+    # Rows and query are unit vectors, so the inner product is the cosine similarity (exact search)
+    scores = _semantic_vectors @ vector
+    best = int(np.argmax(scores))
+    return dict(_semantic_analyses[best]) if scores[best] >= SEMANTIC_CACHE_THRESHOLD else None
+
+def _semantic_add(vector: np.ndarray, analysis: Dict[str, Any]) -> None:
+    global _semantic_vectors, _semantic_analyses, _semantic_dirty
+    if not _semantic_analyses or _semantic_vectors.shape[1] != vector.shape[0]:
+        _semantic_vectors = vector[np.newaxis, :]
+        _semantic_analyses = [analysis]
+    else:
+        _semantic_vectors = np.vstack((_semantic_vectors, vector))[-SEMANTIC_CACHE_MAX_ENTRIES:]
+        _semantic_analyses = (_semantic_analyses + [analysis])[-SEMANTIC_CACHE_MAX_ENTRIES:]
+    _semantic_dirty = True
+
+async def save_semantic_cache() -> None:
+    """Writes the semantic cache back to its store if it changed; call once when the actor finishes."""
+    if not _semantic_dirty:
+        return
+    store = await Actor.open_key_value_store(name=SEMANTIC_CACHE_STORE_NAME)
+    blob = _semantic_vectors.astype(np.float16).tobytes()
+    await store.set_value(_SEMANTIC_VECTORS_KEY, blob, content_type="application/octet-stream")
+    await store.set_value(
+        _SEMANTIC_ANALYSES_KEY,
+        {"dim": int(_semantic_vectors.shape[1]), "dtype": "float16", "analyses": _semantic_analyses},
+    )
+    Actor.log.info(f"Saved {len(_semantic_analyses)} entries to the semantic analysis cache.")
+
+async def analyze_article_summaries(summaries: List[str], is_test_mode: bool) -> List[Dict[str, Any]]:
+    """
+    Analyzes all summaries with one chat completion per ANALYSIS_BATCH_SIZE summaries instead of one per article.
+    Near-duplicates of earlier summaries are answered from the semantic cache. Returns one analysis per summary, in order.
+    """
     if is_test_mode:
         Actor.log.warning("ADMIN TEST MODE: Bypassing LLM analysis call.")
-        return {"sentiment": "Highly Disruptive (TEST)", "category": "Innovation/AI (TEST)", "key_entities": ["Shopify", "Generative AI", "Walmart"]}
+        return [{"sentiment": "Highly Disruptive (TEST)", "category": "Innovation/AI (TEST)", "key_entities": ["Shopify", "Generative AI", "Walmart"]} for _ in summaries]
 
-    client = init_openai()
-    if not summary or len(summary) < 20:
-        Actor.log.warning("Summary too short for analysis. Skipping LLM call.")
-        return {"sentiment": "N/A", "category": "N/A", "key_entities": []}
+    analyses = [{"sentiment": "N/A", "category": "N/A", "key_entities": []} for _ in summaries]
+    pending = [i for i, summary in enumerate(summaries) if summary and len(summary) >= 20]
+    if len(pending) < len(summaries):
+        Actor.log.warning(f"{len(summaries) - len(pending)} summaries too short for analysis. Skipping them.")
+    if not pending:
+        return analyses
 
-    sentiment_options = ["Highly Disruptive", "Growth Trend", "Informational"]
-    category_list_str = ", ".join(CATEGORIES)
-    prompt = f'Analyze the following Retail and Ecommerce news summary: "{summary}"\n\nBased ONLY on the summary, provide a structured JSON output with:\n1. sentiment: The business trend or impact level ({", ".join(sentiment_options)}).\n2. category: The best category from this list: {category_list_str}.\n3. key_entities: A list of up to 3 key brands, platforms, technologies, or people mentioned.\n\nOutput a single valid JSON object.'
+    client = init_openai()
 
+    # One embeddings call for all summaries; a cheap embedding can replace the analysis of a near-duplicate summary
+    vectors = {}
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125",
-            messages=[
-                {"role": "system", "content": "You are a professional Retail and Ecommerce analyst. Return a JSON object with 'sentiment', 'category', and 'key_entities'."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            response_format={"type": "json_object"},
+        await _load_semantic_cache()
+        embeddings = await client.embeddings.create(
+            model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+            input=[summaries[i] for i in pending],
+            dimensions=SEMANTIC_CACHE_DIMENSIONS,
         )
-        output_text = response.choices[0].message.content.strip()
-        parsed = json.loads(output_text)
-        entities = parsed.get("key_entities", [])
-        if not isinstance(entities, list): entities = [str(entities)] if entities else []
-        sentiment = str(parsed.get("sentiment", "N/A")).strip()
-        if sentiment not in sentiment_options: sentiment = "Informational"
-        return {"sentiment": sentiment, "category": str(parsed.get("category", "N/A")).strip(), "key_entities": entities}
+        for i, item in zip(pending, embeddings.data):
+            vector = np.asarray(item.embedding, dtype=np.float32)
+            vectors[i] = vector / np.linalg.norm(vector)
     except Exception as e:
-        Actor.log.warning(f"LLM analysis failed: {e}")
-        return {"sentiment": "Error", "category": "Error", "key_entities": []}
\ No newline at end of file
+        Actor.log.warning(f"Semantic cache lookup failed, analyzing without it: {e}")
+
+    to_analyze = []
+    for i in pending:
+        cached = _semantic_lookup(vectors[i]) if i in vectors else None
+        if cached is not None: analyses[i] = cached
+        else: to_analyze.append(i)
+    if len(to_analyze) < len(pending):
+        Actor.log.info(f"Reusing analyses of near-duplicate summaries for {len(pending) - len(to_analyze)} articles (semantic cache hits).")
+
+    # Near-duplicates within this call: only one representative per group of similar summaries goes to the LLM
+    representative_of: Dict[int, int] = {}
+    embedded = [i for i in to_analyze if i in vectors]
+    if len(embedded) > 1:
+        matrix = np.stack([vectors[i] for i in embedded])
+        similarities = matrix @ matrix.T
+        for row, i in enumerate(embedded):
+            if i in representative_of: continue
+            representative_of[i] = i
+            for col in np.nonzero(similarities[row] >= SEMANTIC_CACHE_THRESHOLD)[0]:
+                representative_of.setdefault(embedded[col], i)
+    representatives = [i for i in to_analyze if representative_of.get(i, i) == i]
+    if len(representatives) < len(to_analyze):
+        Actor.log.info(f"Reusing analyses for {len(to_analyze) - len(representatives)} near-duplicate summaries within this run.")
+    to_analyze = representatives
+
+    for start in range(0, len(to_analyze), ANALYSIS_BATCH_SIZE):
+        batch = to_analyze[start:start + ANALYSIS_BATCH_SIZE]
+        # Only the summaries vary; they come last, after the static system prompt
+        prompt = json.dumps([{"id": i, "summary": summaries[i]} for i in batch])
+        results = {}
+        try:
+            response = await client.chat.completions.create(
+                model="gpt-3.5-turbo-0125",
+                messages=[
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.0,
+                response_format={"type": "json_object"},
+            )
+            output_text = response.choices[0].message.content.strip()
+            items = json.loads(output_text).get("results", [])
+            for item in items if isinstance(items, list) else []:
+                if not isinstance(item, dict): continue
+                try: item_id = int(item.get("id"))
+                except (TypeError, ValueError): continue
+                if item_id in batch: results[item_id] = item
+        except Exception as e:
+            Actor.log.warning(f"LLM analysis failed: {e}")
+
+        for i in batch:
+            parsed = results.get(i)
+            # Per-item fallback: a summary missing from the (or a failed) response is marked as an error
+            if parsed is None:
+                analyses[i] = {"sentiment": "Error", "category": "Error", "key_entities": []}
+                continue
+            entities = parsed.get("key_entities", [])
+            if not isinstance(entities, list): entities = [str(entities)] if entities else []
+            sentiment = str(parsed.get("sentiment", "N/A")).strip()
+            if sentiment not in SENTIMENT_OPTIONS: sentiment = "Informational"
+            analyses[i] = {"sentiment": sentiment, "category": str(parsed.get("category", "N/A")).strip(), "key_entities": entities}
+            if i in vectors: _semantic_add(vectors[i], analyses[i])
+        if len(results) < len(batch):
+            Actor.log.warning(f"LLM analysis returned {len(results)}/{len(batch)} results for this batch.")
+
+    # Only representatives are cached; their vectors already match the rest of their group
+    for i, representative in representative_of.items():
+        if i != representative: analyses[i] = dict(analyses[representative])
+    return analyses